@@ -0,0 +1,290 @@
+"""
+Backfills the columns of fields newly added to a table's configuration, without a full reload.
+
+A fingerprint of each table's configuration is stored in `state_path`. When fields are
+added to a table, a DAP snapshot of the table is pulled, only its key and the new fields
+are kept, and the new columns are filled in with column-only bulk UPDATEs. The table's
+incremental syncs keep running through its `db_query` in the meantime.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import pandas as pd
+from dap.dap_types import Format
+import canvas_extractor
+import data_transformer
+import database_uploader
+import utils
+import config
+
+logger = logging.getLogger(__name__)
+
+# the key of every Canvas table, bound first in the backfill UPDATEs
+KEY_FIELD = "key.id"
+
+
+def get_fingerprint(table_config: dict) -> dict:
+    """
+    Builds the fingerprint of a table's configuration.
+
+    :param1 table_config (dict): The table's configuration.
+    :return: A dictionary with the table's fields and a digest of its configuration.
+    """
+    digest = hashlib.md5(
+        json.dumps(table_config, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+    return {"fields": list(table_config.get("fields")), "digest": digest}
+
+
+def read_fingerprints(user_config: dict) -> dict:
+    """
+    Reads the stored table fingerprints.
+
+    :param1 user_config (dict): The user config.
+    :return: The fingerprints, keyed by Canvas table.
+    """
+    fingerprint_file = user_config.state_path / "fingerprints.json"
+    if not fingerprint_file.is_file():
+        return {}
+
+    with open(fingerprint_file, "r", encoding="utf-8") as fingerprint_stream:
+        return json.load(fingerprint_stream)
+
+
+def write_fingerprints(user_config: dict, fingerprints: dict) -> None:
+    """
+    Stores the table fingerprints.
+
+    :param1 user_config (dict): The user config.
+    :param2 fingerprints (dict): The fingerprints, keyed by Canvas table.
+    :return: None
+    """
+    user_config.state_path.mkdir(parents=True, exist_ok=True)
+    fingerprint_file = user_config.state_path / "fingerprints.json"
+    with open(fingerprint_file, "w", encoding="utf-8") as fingerprint_stream:
+        json.dump(fingerprints, fingerprint_stream, indent=2)
+
+
+def get_added_fields(user_config: dict, fingerprints: dict) -> dict:
+    """
+    Compares each table's configuration with its stored fingerprint.
+
+    Tables without a stored fingerprint have nothing to backfill, they are
+    fingerprinted as they are.
+
+    :param1 user_config (dict): The user config.
+    :param2 fingerprints (dict): The stored fingerprints, keyed by Canvas table.
+    :return: The fields added since the fingerprint, keyed by Canvas table.
+    """
+    added_fields = {}
+    for table, table_config in user_config.canvas_tables.items():
+        fingerprint = fingerprints.get(table)
+        if fingerprint is None or fingerprint.get("digest") == get_fingerprint(
+            table_config
+        ).get("digest"):
+            continue
+
+        fields = [
+            field
+            for field in table_config.get("fields")
+            if field not in fingerprint.get("fields")
+        ]
+        if fields:
+            added_fields[table] = fields
+
+    return added_fields
+
+
+def split_select_list(select_list: str) -> list:
+    """
+    Splits a SELECT list on its top-level commas.
+
+    :param1 select_list (str): The SELECT list.
+    :return: The list of select items.
+    """
+    items, depth, quoted, start = [], 0, False, 0
+    for i, char in enumerate(select_list):
+        if char == "'":
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and not depth and char == ",":
+            items.append(select_list[start:i].strip())
+            start = i + 1
+    items.append(select_list[start:].strip())
+    return items
+
+
+def get_backfill_query(table_config: dict, fields: list) -> str:
+    """
+    Builds the column-only UPDATE for the given fields from the table's `db_query`.
+
+    The target table is the `merge into` table, and each field's column and expression
+    are the alias and expression of its bind in the `using (select ... from dual)` list,
+    so the Oracle columns are expected to be named like the source aliases. The binds are
+    renumbered so the key is `:1` and the fields follow in order.
+
+    :param1 table_config (dict): The table's configuration.
+    :param2 fields (list): The fields to update.
+    :return: The UPDATE statement.
+    """
+    db_query = table_config.get("db_query")
+    target = re.search(r"merge\s+into\s+(\w+)", db_query, re.IGNORECASE)
+    select_list = re.search(
+        r"using\s*\(\s*select\s+(.*?)\s+from\s+dual\b", db_query, re.IGNORECASE | re.DOTALL
+    )
+    if not target or not select_list:
+        logger.error(
+            "The db_query is not a 'merge into ... using (select ... from dual)' query. Cannot build the backfill query."
+        )
+        raise ValueError(
+            "The db_query is not a 'merge into ... using (select ... from dual)' query. Cannot build the backfill query."
+        )
+
+    # map each bind position to its expression and alias
+    columns = {}
+    for item in split_select_list(select_list.group(1)):
+        column = re.match(r"(.*?)\s+as\s+(\w+)$", item, re.IGNORECASE | re.DOTALL)
+        binds = re.findall(r":(\d+)\b", item)
+        if column and len(binds) == 1:
+            columns[int(binds[0])] = column.groups()
+
+    assignments = []
+    all_fields = table_config.get("fields")
+    for new_position, field in enumerate([KEY_FIELD] + fields, start=1):
+        position = all_fields.index(field) + 1
+        if position not in columns:
+            logger.error(
+                "The db_query has no select item for field %s (:%s). Cannot build the backfill query.",
+                field,
+                position,
+            )
+            raise ValueError(
+                f"The db_query has no select item for field {field} (:{position}). Cannot build the backfill query."
+            )
+        expression, alias = columns.get(position)
+        expression = re.sub(rf":{position}\b", f":{new_position}", expression)
+        assignments.append(f"{alias} = {expression}")
+
+    return (
+        f"update {target.group(1)} set {', '.join(assignments[1:])} "
+        f"where {assignments[0]}"
+    )
+
+
+def backfill_table(user_config: dict, table: str, df: pd.DataFrame, fields: list) -> None:
+    """
+    Fills in the given fields of the Oracle table from the DAP snapshot with
+    column-only bulk UPDATEs. Rows rejected by Oracle are written to the table's
+    `_backfill` dead-letter file.
+
+    :param1 user_config (dict): The user config.
+    :param2 table (str): The Canvas table to backfill.
+    :param3 df (pd.DataFrame): The DAP snapshot DataFrame for the table.
+    :param4 fields (list): The fields to backfill.
+    :return: None
+    """
+    sql = get_backfill_query(user_config.canvas_tables.get(table), fields)
+    backfill_df = df.reindex(columns=[KEY_FIELD] + fields)
+    backfill_df = backfill_df.astype(object).where(backfill_df.notna(), None)
+    rows = list(backfill_df.itertuples(index=False, name=None))
+
+    records_affected = 0
+    with database_uploader.get_connection(user_config) as connection:
+
+        with connection.cursor() as cursor:
+            for offset in range(0, len(rows), user_config.batch_size):
+                data = rows[offset : offset + user_config.batch_size]
+                row_counts, errors = database_uploader.execute_batch(cursor, sql, data)
+                records_affected += sum(row_counts)
+
+                if errors:
+                    database_uploader.write_dead_letters(
+                        user_config,
+                        f"{table}_backfill",
+                        [KEY_FIELD] + fields,
+                        data,
+                        errors,
+                        offset,
+                    )
+
+        connection.commit()
+
+    logger.info(
+        "Table [canvas_%s] had [%s] rows backfilled for fields %s.",
+        table,
+        records_affected,
+        fields,
+    )
+
+
+async def main(user_config: dict) -> None:
+    """
+    Main function to backfill the fields added to the tables since the last run,
+    then record the tables' new fingerprints.
+
+    :param1 user_config (dict): The user config.
+    :return: None
+    """
+    fingerprints = read_fingerprints(user_config)
+    added_fields = get_added_fields(user_config, fingerprints)
+
+    if added_fields:
+        backfill_path = user_config.temp_path / "backfill"
+        utils.empty_temp(backfill_path)
+
+        # pull fresh snapshots of the tables to backfill
+        async with canvas_extractor.get_client(user_config) as session:
+            await asyncio.gather(
+                *[
+                    canvas_extractor.get_canvas_data(
+                        session,
+                        table,
+                        backfill_path,
+                        user_config.last_seen,
+                        Format.JSONL,
+                        None,
+                        "snapshot",
+                        user_config.namespace,
+                    )
+                    for table in added_fields
+                ]
+            )
+
+        # keep only the key, the added fields, and the fields used by the table's filter
+        columns_mapping = {
+            table: {
+                "fields": [KEY_FIELD] + fields,
+                "filter": user_config.canvas_tables.get(table).get("filter"),
+            }
+            for table, fields in added_fields.items()
+        }
+        dataframes = data_transformer.load_and_process_json_files(
+            backfill_path / "jsonl", columns_mapping
+        )
+
+        for table, df in dataframes.items():
+            logger.info(
+                "Table [canvas_%s] backfilling added fields %s.", table, added_fields.get(table)
+            )
+            df = data_transformer.apply_filter(
+                df, table, user_config.canvas_tables.get(table).get("filter")
+            )
+            backfill_table(user_config, table, df, added_fields.get(table))
+
+        utils.empty_temp(backfill_path)
+
+    # record the fingerprints of the current table configurations
+    for table, table_config in user_config.canvas_tables.items():
+        fingerprints[table] = get_fingerprint(table_config)
+    write_fingerprints(user_config, fingerprints)
+
+
+if __name__ == "__main__":
+    for run_config in config.get_configs():
+        asyncio.run(main(run_config))
@@ -1,11 +1,14 @@
 """
-Retrieves data files from DAP in JSONL format and outputs them to the data/temp folder.
+Retrieves data files from DAP in the configured format and outputs them to the data/temp folder.
+With several Canvas instances configured, each instance pulls through its own DAP session
+into its own temp subdirectory, from one shared work queue.
 """
 
 import datetime
 import shutil
 import asyncio
 import logging
+import contextlib
 from pathlib import Path
 from dap.api import DAPClient
 from dap.dap_types import Credentials
@@ -16,22 +19,42 @@ import config
 logger = logging.getLogger(__name__)
 
 
+def get_client(user_config: dict) -> DAPClient:
+    """
+    Creates a DAP client with the DAP credentials of the config's Canvas instance.
+
+    :param1 user_config (dict): The user config.
+    :return: A DAPClient for the instance.
+    """
+    return DAPClient(
+        base_url=user_config.dap_api_url,
+        credentials=Credentials.create(
+            client_id=user_config.dap_client_id,
+            client_secret=user_config.dap_client_secret,
+        ),
+    )
+
+
 async def get_canvas_data(
+    session,
     table: str,
     output_directory: Path,
     last_seen: datetime,
     data_format: Format = Format.JSONL,
     mode: Mode = None,
     query_type: str = "incremental",
+    namespace: str = "canvas",
 ) -> None:
     """
     Retrieves data files from Canvas for the specified Canvas table.
 
+    :param session: An open DAP session, see `get_client`.
     :param table: A Canvas table:
     https://data-access-platform-api.s3.amazonaws.com/tables/catalog.html#datasets
     :param output_directory: The output directory for the generated data files.
     :param format: The desired format for the data files: `CSV`, `JSONL`, `TSV`, or `Parquet`
     :param query_type: The desired query type: `incremental` or `snapshot`
+    :param namespace: The DAP namespace of the table.
     """
 
     output_directory = output_directory / data_format.name.lower()
@@ -39,55 +62,54 @@ async def get_canvas_data(
     # ensure output directory exists
     output_directory.mkdir(parents=True, exist_ok=True)
 
-    async with DAPClient() as session:
-        if query_type == "snapshot":
-            query = SnapshotQuery(format=data_format, mode=mode)
-        elif query_type == "incremental":
-            query = IncrementalQuery(
-                format=data_format, mode=mode, since=last_seen, until=None
-            )
-        else:
-            logger.error("Invalid query_type: %s. Must be 'incremental' or 'snapshot'.", query_type)
-            raise ValueError(f"Invalid query_type: {query_type}. Must be 'incremental' or 'snapshot'.")
-
-        # fetch table data into web server
-        query_object = await session.get_table_data("canvas", table, query)
-
-        filenames = []
-        for i_object in query_object.objects:
-            filename = await session.download_object(
-                i_object, output_directory, decompress=True
-            )  # outputs in UTF-8 encoding
-            filenames.append(filename)
-
-        p = Path(filenames[0])
-        final_file = p.with_stem(table)
-
-        # TODO: This also merges headers for CSV and TSV files,
-        # figure out how to resolve. Works fine for JSON
-
-        if len(filenames) > 1:
-            # merge files if more than one
-            with open(final_file, "wb") as wfd:
-                for file in filenames:
-                    with open(file, "rb") as fd:
-                        await asyncio.to_thread(shutil.copyfileobj, fd, wfd)
-                        logger.info("Merged file: %s", final_file)
-
-            # delete original files
-            for file in filenames:
-                file_path = Path(file)
-                if file_path.is_file():
-                    file_path.unlink()
-                    logger.info("Deleted file: %s", file_path)
-
-        else:
-            # rename the single file
-            p.rename(p.with_stem(table))
-            logger.info("Created file: %s", final_file)
-
-
-async def update_all(work_queue: asyncio.Queue, user_config: dict) -> None:
+    if query_type == "snapshot":
+        query = SnapshotQuery(format=data_format, mode=mode)
+    elif query_type == "incremental":
+        query = IncrementalQuery(
+            format=data_format, mode=mode, since=last_seen, until=None
+        )
+    else:
+        logger.error("Invalid query_type: %s. Must be 'incremental' or 'snapshot'.", query_type)
+        raise ValueError(f"Invalid query_type: {query_type}. Must be 'incremental' or 'snapshot'.")
+
+    # fetch table data into web server
+    query_object = await session.get_table_data(namespace, table, query)
+
+    filenames = []
+    for i_object in query_object.objects:
+        filename = await session.download_object(
+            i_object, output_directory, decompress=True
+        )  # outputs in UTF-8 encoding
+        filenames.append(filename)
+
+    p = Path(filenames[0])
+    final_file = p.with_stem(table)
+
+    if len(filenames) > 1:
+        # merge files if more than one
+        with open(final_file, "wb") as wfd:
+            for i, file in enumerate(filenames):
+                with open(file, "rb") as fd:
+                    # CSV and TSV parts each start with a header row, keep only the first
+                    if i > 0 and data_format in {Format.CSV, Format.TSV}:
+                        fd.readline()
+                    await asyncio.to_thread(shutil.copyfileobj, fd, wfd)
+                    logger.info("Merged file: %s", final_file)
+
+        # delete original files
+        for file in filenames:
+            file_path = Path(file)
+            if file_path.is_file():
+                file_path.unlink()
+                logger.info("Deleted file: %s", file_path)
+
+    else:
+        # rename the single file
+        p.rename(p.with_stem(table))
+        logger.info("Created file: %s", final_file)
+
+
+async def update_all(work_queue: asyncio.Queue, sessions: dict) -> None:
     """
     Processes tasks from the work queue to update data for the specified table.
 
@@ -96,74 +118,79 @@ async def update_all(work_queue: asyncio.Queue, user_config: dict) -> None:
     during the process. It ensures that each task is marked as done in the queue
     after processing.
 
-    :param table_id: A unique identifier for the task. This is used for logging purposes.
-    :param work_queue: An asyncio.Queue instance containing the list of tables to be processed.
+    :param work_queue: An asyncio.Queue instance containing the (user config, table) pairs to be processed.
+    :param sessions: The open DAP session of each Canvas instance, by instance name.
     :return: None
     """
 
     while not work_queue.empty():
-        table = await work_queue.get()
+        user_config, table = await work_queue.get()
+        task = f"{user_config.instance}.{table}" if user_config.instance else table
 
         try:
             logger.info(
-                "Task [%s] beginning Canvas data pull for table: %s.", table, table
+                "Task [%s] beginning Canvas data pull for table: %s.", task, table
             )
             await get_canvas_data(
+                sessions.get(user_config.instance),
                 table,
                 user_config.temp_path,
                 user_config.last_seen,
                 user_config.canvas_format,
                 user_config.canvas_mode,
                 user_config.canvas_tables.get(table).get("query_type"),
+                user_config.namespace,
             )
             logger.info(
-                "Task [%s] completed Canvas data pull for table: %s.", table, table
+                "Task [%s] completed Canvas data pull for table: %s.", task, table
             )
         except Exception as e:
-            logger.error("Task [%s] failed for table: %s. Error: %s", table, table, e)
-            raise RuntimeError(f"Task [{table}] failed for table: {table}") from e
+            logger.error("Task [%s] failed for table: %s. Error: %s", task, table, e)
+            raise RuntimeError(f"Task [{task}] failed for table: {table}") from e
         finally:
             work_queue.task_done()  # mark the task as done in the queue
 
 
-async def main(user_config: dict) -> None:
+async def main(user_configs: list) -> None:
     """
     Main function that sets up the work queue, creates tasks for updating tables,
     and handles exceptions.
 
-    This function initializes an asyncio.Queue with a list of tables. It creates
-    tasks to process each table concurrently using the `update_all` function. It
-    collects results from all tasks and logs any exceptions encountered.
+    This function initializes an asyncio.Queue with the tables of every Canvas
+    instance. It opens one DAP session per instance and creates tasks to process
+    each table concurrently using the `update_all` function. It collects results
+    from all tasks and logs any exceptions encountered.
 
-    :param1 user_config (dict): The user config.
+    :param1 user_configs (list): The user config of each Canvas instance.
     :return: None
     """
 
-    # empty temp folders
-    utils.empty_temp(user_config.temp_path)
-
-    # create DAP credentials
-    Credentials.create(
-        client_id=user_config.dap_client_id, client_secret=user_config.dap_client_secret
-    )
-
     # intialize work queue
     work_queue = asyncio.Queue()
 
-    # get tables defined in the config
-    tables = user_config.canvas_tables.keys()
+    for user_config in user_configs:
+        # empty temp folders
+        utils.empty_temp(user_config.temp_path)
+
+        # add the instance's tables defined in the config to the queue
+        for table in user_config.canvas_tables.keys():
+            await work_queue.put((user_config, table))
 
-    # add tables to the queue
-    for table in tables:
-        await work_queue.put(table)
+    async with contextlib.AsyncExitStack() as stack:
+        # open a DAP session with each instance's credentials
+        sessions = {
+            user_config.instance: await stack.enter_async_context(get_client(user_config))
+            for user_config in user_configs
+        }
 
-    # create and gather tasks for updating all tables
-    tasks = [
-        asyncio.create_task(update_all(work_queue, user_config)) for table in tables
-    ]
+        # create and gather tasks for updating all tables
+        tasks = [
+            asyncio.create_task(update_all(work_queue, sessions))
+            for _ in range(work_queue.qsize())
+        ]
 
-    # optionally handle exceptions for individual tasks
-    results = await asyncio.gather(*tasks, return_exceptions=True)
+        # optionally handle exceptions for individual tasks
+        results = await asyncio.gather(*tasks, return_exceptions=True)
 
     # handle exceptions if needed
     for result in results:
@@ -173,5 +200,5 @@ async def main(user_config: dict) -> None:
 
 
 if __name__ == "__main__":
-    run_config = config.get_config()
-    asyncio.run(main(run_config))
+    run_configs = config.get_configs()
+    asyncio.run(main(run_configs))
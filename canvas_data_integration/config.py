@@ -4,6 +4,8 @@ and environment variables from either the system or an included .env file.
 """
 
 import os
+import re
+import copy
 import logging
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
@@ -37,12 +39,21 @@ class Config:
         self,
         final_path: Path,
         temp_path: Path,
+        state_path: Path,
+        dead_letter_path: Path,
         batch_size: int,
+        commit_interval: int,
         past_days: int,
         log_retention_period: int,
         str_format: str,
         canvas_format: Format,
+        final_format: str,
+        transform_engine: str,
         canvas_tables: dict,
+        aggregates: dict,
+        instance: str,
+        namespace: str,
+        db_pool_size: int,
         db_host: str,
         db_port: int,
         db_service: str,
@@ -57,11 +68,21 @@ class Config:
 
         :param final_path: The path where final output files are stored.
         :param temp_path: The path where temporary files are stored.
+        :param state_path: The path where pipeline state, like upload checkpoints, is stored.
+        :param dead_letter_path: The path where rows rejected by the database are stored.
         :param batch_size: The batch size for merging records into the database.
+        :param commit_interval: How many batches to merge between commits, 0 to commit once per table.
         :param past_days: How many days in the past to search for updated records.
         :param log_retention_period: How many days to keeps logs for.
         :param str_format: The format for the Canvas data files (string representation).
         :param canvas_format: The format for the Canvas data files.
+        :param final_format: The format for the final data files: `csv` or `arrow`.
+        :param transform_engine: The engine of the transform stage: `pandas` or `arrow`.
+        :param canvas_tables: The Canvas tables to retrieve, with their fields and merge queries.
+        :param aggregates: The aggregate tables to refresh from the keys changed in each run.
+        :param instance: The name of the Canvas instance, or None when only one is configured.
+        :param namespace: The DAP namespace of the Canvas tables.
+        :param db_pool_size: The maximum number of pooled Oracle connections shared by all instances.
         :param db_host: The host address of the database.
         :param db_port: The port number of the database.
         :param db_service: The service name of the database.
@@ -73,12 +94,21 @@ class Config:
         """
         self.final_path = final_path
         self.temp_path = temp_path
+        self.state_path = state_path
+        self.dead_letter_path = dead_letter_path
         self.batch_size = batch_size or 10000
+        self.commit_interval = commit_interval or 0
         self.past_days = past_days or 3
         self.log_retention_period = log_retention_period or 30
         self.str_format = str_format
         self.canvas_format = canvas_format
+        self.final_format = final_format or "csv"
+        self.transform_engine = transform_engine or "pandas"
         self.canvas_tables = canvas_tables
+        self.aggregates = aggregates or {}
+        self.instance = instance
+        self.namespace = namespace or "canvas"
+        self.db_pool_size = db_pool_size or 4
         self.db_host = db_host
         self.db_port = db_port
         self.db_service = db_service
@@ -104,13 +134,22 @@ class Config:
         return (
             f"Config(final_path={self.final_path}\n"
             f"temp_path={self.temp_path}\n"
+            f"state_path={self.state_path}\n"
+            f"dead_letter_path={self.dead_letter_path}\n"
             f"batch_size={self.batch_size}\n"
+            f"commit_interval={self.commit_interval}\n"
             f"past_days={self.past_days}\n"
             f"log_retention_period={self.log_retention_period}\n"
             f"format='{self.str_format}'\n"
             f"canvas_format='{self.canvas_format}'\n"
             f"canvas_mode='{self.canvas_mode}'\n"
+            f"final_format='{self.final_format}'\n"
+            f"transform_engine='{self.transform_engine}'\n"
             f"canvas_tables='{self.canvas_tables}'\n"
+            f"aggregates='{self.aggregates}'\n"
+            f"instance='{self.instance}'\n"
+            f"namespace='{self.namespace}'\n"
+            f"db_pool_size={self.db_pool_size}\n"
             f"db_host='{self.db_host}'\n"
             f"db_port={self.db_port}\n"
             f"db_service='{self.db_service}'\n"
@@ -154,6 +193,59 @@ def get_format(config_format: str = "JSONL") -> Format:
             return Format.JSONL
 
 
+def get_final_format(config_format: str = "CSV") -> str:
+    """
+    Accepts a selected format for the final data files from config.yml,
+    and returns the corresponding file extension used for the final data files.
+
+    :param1 config_format (str): The desired format for the final data files, specified
+    in the config file: `CSV` or `Arrow`
+    :returns: Corresponding final file extension: `csv` or `arrow`.
+    """
+
+    config_format = config_format or "CSV"
+    config_format = config_format.lower().strip()
+
+    match config_format:
+        case "csv":
+            return "csv"
+        case "arrow" | "feather" | "ipc":
+            return "arrow"
+        case _:
+            logger.warning(
+                "Specified final format does not exist, expected one of (CSV, Arrow): %s",
+                config_format,
+            )
+            logger.info("Defaulting to CSV.")
+            return "csv"
+
+
+def get_transform_engine(config_engine: str = "pandas") -> str:
+    """
+    Accepts a selected transform engine from config.yml, and returns its name.
+
+    :param1 config_engine (str): The desired transform engine, specified
+    in the config file: `pandas` or `Arrow`
+    :returns: Corresponding transform engine name: `pandas` or `arrow`.
+    """
+
+    config_engine = config_engine or "pandas"
+    config_engine = config_engine.lower().strip()
+
+    match config_engine:
+        case "pandas":
+            return "pandas"
+        case "arrow" | "pyarrow":
+            return "arrow"
+        case _:
+            logger.warning(
+                "Specified transform engine does not exist, expected one of (pandas, Arrow): %s",
+                config_engine,
+            )
+            logger.info("Defaulting to pandas.")
+            return "pandas"
+
+
 def validate_config(config_path: Path) -> dict:
     """
     Retrieve config settings from `config.yml` and validate them.
@@ -190,6 +282,18 @@ def validate_config(config_path: Path) -> dict:
             "Configuration field 'final_path' in config.yml is empty. Using default: %s",
             config["final_path"],
         )
+    if config.get("state_path") is None:
+        config["state_path"] = "../data/state"
+        logger.warning(
+            "Configuration field 'state_path' in config.yml is empty. Using default: %s",
+            config["state_path"],
+        )
+    if config.get("dead_letter_path") is None:
+        config["dead_letter_path"] = "../data/dead_letter"
+        logger.warning(
+            "Configuration field 'dead_letter_path' in config.yml is empty. Using default: %s",
+            config["dead_letter_path"],
+        )
     if config.get("canvas_format") is None:
         config["canvas_format"] = Format.JSONL
         logger.warning(
@@ -198,12 +302,40 @@ def validate_config(config_path: Path) -> dict:
         )
     else:
         config["canvas_format"] = get_format(config.get("canvas_format"))
+    if config.get("final_format") is None:
+        config["final_format"] = "csv"
+        logger.warning(
+            "Configuration field 'final_format' in config.yml is empty. Using default: %s",
+            config["final_format"],
+        )
+    else:
+        config["final_format"] = get_final_format(config.get("final_format"))
+    if config.get("transform_engine") is None:
+        config["transform_engine"] = "pandas"
+        logger.warning(
+            "Configuration field 'transform_engine' in config.yml is empty. Using default: %s",
+            config["transform_engine"],
+        )
+    else:
+        config["transform_engine"] = get_transform_engine(config.get("transform_engine"))
     if config.get("batch_size") is None:
         config["batch_size"] = 10000
         logger.warning(
             "Configuration field 'batch_size' in config.yml is empty. Using default: %s",
             config["batch_size"],
         )
+    if config.get("commit_interval") is None:
+        config["commit_interval"] = 0
+        logger.warning(
+            "Configuration field 'commit_interval' in config.yml is empty. Using default: %s",
+            config["commit_interval"],
+        )
+    if config.get("db_pool_size") is None:
+        config["db_pool_size"] = 4
+        logger.warning(
+            "Configuration field 'db_pool_size' in config.yml is empty. Using default: %s",
+            config["db_pool_size"],
+        )
     if config.get("past_days") is None:
         config["past_days"] = 3
         logger.warning(
@@ -244,6 +376,57 @@ def validate_config(config_path: Path) -> dict:
                         f"'canvas_tables' table '{key}' configuration dictionary in config.yml is missing one of 'query_type': (incremental or snapshot), "
                         + "'fields': [list of canvas table fields to retrieve], or 'db_query': (merge query for the Oracle table destination). Cannot proceed."
                     )
+                if table.get("db_delete") is not None and not isinstance(
+                    table.get("db_delete"), str
+                ):
+                    logger.error(
+                        "'canvas_tables' table '%s' 'db_delete' configuration in config.yml must be a delete query. Cannot proceed.",
+                        key,
+                    )
+                    raise RuntimeError(
+                        f"'canvas_tables' table '{key}' 'db_delete' configuration in config.yml must be a delete query. Cannot proceed."
+                    )
+                if table.get("filter") is not None and not isinstance(
+                    table.get("filter"), list
+                ):
+                    logger.error(
+                        "'canvas_tables' table '%s' 'filter' configuration in config.yml must be a list of conditions. Cannot proceed.",
+                        key,
+                    )
+                    raise RuntimeError(
+                        f"'canvas_tables' table '{key}' 'filter' configuration in config.yml must be a list of conditions. Cannot proceed."
+                    )
+                if table.get("reconcile") is not None and (
+                    not isinstance(table.get("reconcile"), dict)
+                    or table.get("reconcile").get("db_table") is None
+                    or table.get("reconcile").get("db_key") is None
+                    or not isinstance(table.get("reconcile").get("columns"), dict)
+                ):
+                    logger.error(
+                        "'canvas_tables' table '%s' 'reconcile' configuration in config.yml must be a dictionary with 'db_table': (Oracle table), "
+                        + "'db_key': (Oracle key column), and 'columns': {canvas table field: Oracle text expression}. Cannot proceed.",
+                        key,
+                    )
+                    raise RuntimeError(
+                        f"'canvas_tables' table '{key}' 'reconcile' configuration in config.yml must be a dictionary with 'db_table': (Oracle table), "
+                        + "'db_key': (Oracle key column), and 'columns': {canvas table field: Oracle text expression}. Cannot proceed."
+                    )
+                if table.get("key_index") is not None and (
+                    not isinstance(table.get("key_index"), dict)
+                    or table.get("key_index").get("db_table") is None
+                    or table.get("key_index").get("db_key") is None
+                    or table.get("key_index").get("db_insert") is None
+                    or table.get("key_index").get("db_update") is None
+                ):
+                    logger.error(
+                        "'canvas_tables' table '%s' 'key_index' configuration in config.yml must be a dictionary with 'db_table': (Oracle table), "
+                        + "'db_key': (Oracle key column), 'db_insert': (insert query), and 'db_update': (update query). Cannot proceed.",
+                        key,
+                    )
+                    raise RuntimeError(
+                        f"'canvas_tables' table '{key}' 'key_index' configuration in config.yml must be a dictionary with 'db_table': (Oracle table), "
+                        + "'db_key': (Oracle key column), 'db_insert': (insert query), and 'db_update': (update query). Cannot proceed."
+                    )
             else:
                 logger.error(
                     "'canvas_tables' table '%s' configuration dictionary in config.yml is not structured as a dictionary. Cannot proceed.",
@@ -260,15 +443,127 @@ def validate_config(config_path: Path) -> dict:
             "'canvas_tables' configuration dictionary in config.yml is not structured as a dictionary. Cannot proceed."
         )
 
+    # check the optional aggregates entry in the config
+    if config.get("aggregates") is None:
+        config["aggregates"] = {}
+    elif isinstance(config.get("aggregates"), dict):
+        for key in config.get("aggregates").keys():
+            aggregate = config.get("aggregates").get(key)
+            if (
+                not isinstance(aggregate, dict)
+                or aggregate.get("key_table") is None
+                or not isinstance(aggregate.get("db_refresh"), list)
+            ):
+                logger.error(
+                    "'aggregates' entry '%s' in config.yml must be a dictionary with 'key_table': (table for the changed keys), "
+                    + "and 'db_refresh': [list of refresh statements]. Cannot proceed.",
+                    key,
+                )
+                raise RuntimeError(
+                    f"'aggregates' entry '{key}' in config.yml must be a dictionary with 'key_table': (table for the changed keys), "
+                    + "and 'db_refresh': [list of refresh statements]. Cannot proceed."
+                )
+    else:
+        logger.error(
+            "'aggregates' configuration dictionary in config.yml is not structured as a dictionary. Cannot proceed."
+        )
+        raise RuntimeError(
+            "'aggregates' configuration dictionary in config.yml is not structured as a dictionary. Cannot proceed."
+        )
+
+    # check the optional instances entry in the config
+    if config.get("instances") is None:
+        config["instances"] = {}
+    elif isinstance(config.get("instances"), dict):
+        target_prefixes = set()
+        for key in config.get("instances").keys():
+            instance = config.get("instances").get(key) or {}
+            config["instances"][key] = instance
+            if not isinstance(instance, dict) or not set(
+                instance.get("tables") or []
+            ).issubset(config.get("canvas_tables").keys()):
+                logger.error(
+                    "'instances' entry '%s' in config.yml must be a dictionary, and its 'tables' must be defined in 'canvas_tables'. Cannot proceed.",
+                    key,
+                )
+                raise RuntimeError(
+                    f"'instances' entry '{key}' in config.yml must be a dictionary, and its 'tables' must be defined in 'canvas_tables'. Cannot proceed."
+                )
+
+            # instances loading into the same Oracle tables would overwrite each other
+            target_prefix = instance.get("target_prefix") or "canvas_"
+            if target_prefix in target_prefixes:
+                logger.error(
+                    "'instances' entry '%s' in config.yml has the same 'target_prefix' as another instance: %s. Cannot proceed.",
+                    key,
+                    target_prefix,
+                )
+                raise RuntimeError(
+                    f"'instances' entry '{key}' in config.yml has the same 'target_prefix' as another instance: {target_prefix}. Cannot proceed."
+                )
+            target_prefixes.add(target_prefix)
+    else:
+        logger.error(
+            "'instances' configuration dictionary in config.yml is not structured as a dictionary. Cannot proceed."
+        )
+        raise RuntimeError(
+            "'instances' configuration dictionary in config.yml is not structured as a dictionary. Cannot proceed."
+        )
+
     return config
 
 
-def validate_env(env_path: Path) -> dict:
+def apply_target_prefix(sql: str, target_prefix: str) -> str:
+    """
+    Replaces the `canvas_` prefix of the Oracle objects in a statement with an
+    instance's target prefix.
+
+    :param1 sql (str): The SQL statement or Oracle object name.
+    :param2 target_prefix (str): The instance's prefix for its Oracle objects.
+    :return: The statement with the prefix applied.
+    """
+    if target_prefix == "canvas_":
+        return sql
+    return re.sub(r"\bcanvas_", target_prefix, sql)
+
+
+def get_instance_tables(canvas_tables: dict, tables: list, target_prefix: str) -> dict:
+    """
+    Copies an instance's tables from `canvas_tables`, with its target prefix applied
+    to their Oracle statements and object names.
+
+    :param1 canvas_tables (dict): The `canvas_tables` configuration.
+    :param2 tables (list): The instance's tables.
+    :param3 target_prefix (str): The instance's prefix for its Oracle objects.
+    :return: The instance's table configurations.
+    """
+    instance_tables = {}
+    for table in tables:
+        table_config = copy.deepcopy(canvas_tables.get(table))
+        for key in ("db_query", "db_delete"):
+            if table_config.get(key):
+                table_config[key] = apply_target_prefix(table_config[key], target_prefix)
+        for section, keys in (
+            ("key_index", ("db_table", "db_insert", "db_update")),
+            ("reconcile", ("db_table",)),
+        ):
+            for key in keys if table_config.get(section) else ():
+                table_config[section][key] = apply_target_prefix(
+                    table_config[section][key], target_prefix
+                )
+        instance_tables[table] = table_config
+
+    return instance_tables
+
+
+def validate_env(env_path: Path, env_prefix: str = "") -> dict:
     """
     Retrieve environment variables trying the system first, then a `.env` file.
     Finally, validate them.
 
     :param1 env_path (Path): The path to the environment file.
+    :param2 env_prefix (str): The prefix of the DAP variables of a Canvas instance,
+    e.g. `PARTNER_` for `PARTNER_DAP_CLIENT_ID`.
     :return (dict): A dictionary with values from the environment file.
     """
     env = {
@@ -282,9 +577,9 @@ def validate_env(env_path: Path) -> dict:
         "db_password": None,
     }
 
-    env["dap_api_url"] = os.environ.get("DAP_API_URL")
-    env["dap_client_id"] = os.environ.get("DAP_CLIENT_ID")
-    env["dap_client_secret"] = os.environ.get("DAP_CLIENT_SECRET")
+    env["dap_api_url"] = os.environ.get(f"{env_prefix}DAP_API_URL")
+    env["dap_client_id"] = os.environ.get(f"{env_prefix}DAP_CLIENT_ID")
+    env["dap_client_secret"] = os.environ.get(f"{env_prefix}DAP_CLIENT_SECRET")
     env["db_host"] = os.environ.get("DB_HOST")
     env["db_port"] = os.environ.get("DB_PORT")
     env["db_service"] = os.environ.get("DB_SERVICE")
@@ -307,9 +602,9 @@ def validate_env(env_path: Path) -> dict:
             )
         else:
             load_dotenv(env_path)
-            env["dap_api_url"] = os.environ.get("DAP_API_URL")
-            env["dap_client_id"] = os.environ.get("DAP_CLIENT_ID")
-            env["dap_client_secret"] = os.environ.get("DAP_CLIENT_SECRET")
+            env["dap_api_url"] = os.environ.get(f"{env_prefix}DAP_API_URL")
+            env["dap_client_id"] = os.environ.get(f"{env_prefix}DAP_CLIENT_ID")
+            env["dap_client_secret"] = os.environ.get(f"{env_prefix}DAP_CLIENT_SECRET")
             env["db_host"] = os.environ.get("DB_HOST")
             env["db_port"] = os.environ.get("DB_PORT")
             env["db_service"] = os.environ.get("DB_SERVICE")
@@ -332,43 +627,89 @@ def validate_env(env_path: Path) -> dict:
         return env
 
 
-def get_config() -> Config:
+def get_configs() -> list:
     """
     Looks for a valid config.yml file in the base project directory.
     If there is none, uses defaults.
 
-    :returns: A Config object that includes a data format and paths.
+    With an `instances` entry, returns one Config per Canvas instance, each with its
+    own DAP credentials, namespace, tables, Oracle prefix and data subdirectories,
+    and the shared Oracle settings.
+
+    :returns: A list of Config objects that include a data format and paths.
     """
     config_path = Path(__file__).parent / "../config.yml"
     config = validate_config(config_path)
 
     # Development only. In production, use system environment variables
     env_path = Path(__file__).parent / "../.env"
-    env = validate_env(env_path)
-
-    config = Config(
-        final_path=Path(__file__).parent / config.get("final_path"),
-        temp_path=Path(__file__).parent / config.get("temp_path"),
-        batch_size=config.get("batch_size"),
-        past_days=config.get("past_days"),
-        log_retention_period=config.get("log_retention_period"),
-        str_format=config.get("canvas_format").name,  # string representation of format
-        canvas_format=config.get("canvas_format"),  # actual format
-        canvas_tables=config.get("canvas_tables"),
-        db_host=env.get("db_host"),
-        db_port=env.get("db_port"),
-        db_service=env.get("db_service"),
-        dap_api_url=env.get("dap_api_url"),
-        dap_client_id=env.get("dap_client_id"),
-        dap_client_secret=env.get("dap_client_secret"),
-        db_username=env.get("db_username"),
-        db_password=env.get("db_password"),
-    )
+
+    configs = []
+    for name, instance in (config.get("instances") or {None: {}}).items():
+        env = validate_env(env_path, instance.get("env_prefix") or "")
+        target_prefix = instance.get("target_prefix") or "canvas_"
+        tables = instance.get("tables") or list(config.get("canvas_tables").keys())
+
+        # each instance keeps its data files and state in its own subdirectory
+        paths = {
+            key: Path(__file__).parent / config.get(key) / (name or "")
+            for key in ("final_path", "temp_path", "state_path", "dead_letter_path")
+        }
+
+        aggregates = copy.deepcopy(config.get("aggregates"))
+        for aggregate in aggregates.values():
+            aggregate["key_table"] = apply_target_prefix(aggregate["key_table"], target_prefix)
+            aggregate["db_refresh"] = [
+                apply_target_prefix(sql, target_prefix) for sql in aggregate["db_refresh"]
+            ]
+
+        configs.append(
+            Config(
+                final_path=paths.get("final_path"),
+                temp_path=paths.get("temp_path"),
+                state_path=paths.get("state_path"),
+                dead_letter_path=paths.get("dead_letter_path"),
+                batch_size=config.get("batch_size"),
+                commit_interval=config.get("commit_interval"),
+                past_days=config.get("past_days"),
+                log_retention_period=config.get("log_retention_period"),
+                str_format=config.get("canvas_format").name,  # string representation of format
+                canvas_format=config.get("canvas_format"),  # actual format
+                final_format=config.get("final_format"),
+                transform_engine=config.get("transform_engine"),
+                canvas_tables=get_instance_tables(
+                    config.get("canvas_tables"), tables, target_prefix
+                ),
+                aggregates=aggregates,
+                instance=name,
+                namespace=instance.get("namespace"),
+                db_pool_size=config.get("db_pool_size"),
+                db_host=env.get("db_host"),
+                db_port=env.get("db_port"),
+                db_service=env.get("db_service"),
+                dap_api_url=env.get("dap_api_url"),
+                dap_client_id=env.get("dap_client_id"),
+                dap_client_secret=env.get("dap_client_secret"),
+                db_username=env.get("db_username"),
+                db_password=env.get("db_password"),
+            )
+        )
 
     # clean old logs
-    utils.clean_old_logs(log_path, config.log_retention_period)
+    utils.clean_old_logs(log_path, configs[0].log_retention_period)
 
-    return config
+    return configs
+
+
+def get_config() -> Config:
+    """
+    Looks for a valid config.yml file in the base project directory.
+    If there is none, uses defaults.
+
+    :returns: A Config object that includes a data format and paths. With several
+    Canvas instances configured, the Config of the first instance.
+    """
+    return get_configs()[0]
 
 
 if __name__ == "__main__":
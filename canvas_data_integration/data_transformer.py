@@ -1,15 +1,42 @@
 """
-Imports the JSON Line files into pandas dataframes, flattens them,
+Imports the JSON Line, CSV or TSV files into pandas dataframes, flattens them,
 and extracts only the selected columns for each table for further operations.
+
+The transform stage runs on the engine selected by `transform_engine`: `PandasEngine`,
+the default, or `ArrowEngine`, which keeps the tables as Arrow tables and uses the
+multithreaded Arrow kernels for every step.
 """
 
 import logging
+import re
+from datetime import date, datetime, timedelta, timezone
 from pathlib import Path
+import yaml
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.feather as feather
+import pyarrow.json as pa_json
+import utils
 import config
 
 logger = logging.getLogger(__name__)
 
+# a filter condition: `<field> <operator> <value>`, e.g. `value.workflow_state in [active, completed]`
+CONDITION_PATTERN = re.compile(r"^\s*(\S+)\s+(not in|in|==|!=|>=|<=|>|<)\s+(.+?)\s*$")
+DAYS_AGO_PATTERN = re.compile(r"^(\d+) days ago$")
+
+# DAP marks incremental deletion records with `meta.action`, they only carry a key
+DELETE_ACTIONS = ["D", "delete"]
+
+# the text DAP writes booleans as in CSV and TSV files
+BOOLEAN_TEXT = ["true", "false"]
+
+# the size of the blocks the Arrow readers parse in parallel
+BLOCK_SIZE = 1 << 24
+
 
 def flatten_and_select_columns(df: pd.DataFrame, columns: list) -> pd.DataFrame:
     """
@@ -26,6 +53,229 @@ def flatten_and_select_columns(df: pd.DataFrame, columns: list) -> pd.DataFrame:
     return filtered_df
 
 
+def parse_condition(condition: str) -> tuple:
+    """
+    Parses a filter condition from config.yml into its field, operator and value.
+
+    Values are read as YAML, so `[active, completed]` is a list and `2024-01-01` a date.
+    Dates are compared as ISO-8601 text, like the DAP timestamps, and `N days ago`
+    is replaced by the date N days before today (UTC).
+
+    :param1 condition (str): The filter condition, e.g. `meta.ts >= 365 days ago`.
+    :return: A tuple of (field, operator, value).
+    """
+    match = CONDITION_PATTERN.match(str(condition))
+    if match is None:
+        logger.error("Invalid filter condition: %s", condition)
+        raise ValueError(
+            f"Invalid filter condition: {condition}. Expected '<field> <operator> <value>' "
+            + "with one of the operators: in, not in, ==, !=, >=, <=, >, <."
+        )
+
+    field, operator, raw_value = match.groups()
+    days_ago = DAYS_AGO_PATTERN.match(raw_value)
+    if days_ago:
+        value = (datetime.now(timezone.utc) - timedelta(days=int(days_ago.group(1)))).date()
+    else:
+        value = yaml.safe_load(raw_value)
+
+    values = value if isinstance(value, list) else [value]
+    values = [v.isoformat() if isinstance(v, (date, datetime)) else v for v in values]
+
+    if operator in {"in", "not in"}:
+        return field, operator, values
+    return field, operator, values[0]
+
+
+def is_numeric_condition(value) -> bool:
+    """
+    Checks whether a filter condition compares with numbers. Fields read as text from
+    CSV and TSV files are then compared as numbers too, like the JSON Lines fields.
+
+    :param1 value: The condition's value, or list of values.
+    :return: True if every value is a number.
+    """
+    values = value if isinstance(value, list) else [value]
+    return bool(values) and all(
+        isinstance(v, (int, float)) and not isinstance(v, bool) for v in values
+    )
+
+
+def get_compared_column(df: pd.DataFrame, field: str, value) -> pd.Series:
+    """
+    Returns the column a filter condition compares with its value, as numbers if the
+    value is numeric, see `is_numeric_condition`.
+
+    :param1 df (pd.DataFrame): The projected DataFrame.
+    :param2 field (str): The condition's field.
+    :param3 value: The condition's value, or list of values.
+    :return: The column to compare.
+    """
+    column = df[field]
+    if is_numeric_condition(value) and not pd.api.types.is_numeric_dtype(column):
+        return pd.to_numeric(column, errors="coerce")
+    return column
+
+
+def compile_filter(conditions: list) -> list:
+    """
+    Compiles the filter conditions of a table into vectorized predicates.
+
+    :param1 conditions (list): The table's filter conditions from config.yml.
+    :return: A list of functions that each map a DataFrame to a boolean mask.
+    """
+    operators = {
+        "in": lambda column, value: column.isin(value),
+        "not in": lambda column, value: ~column.isin(value),
+        "==": lambda column, value: column == value,
+        "!=": lambda column, value: column != value,
+        ">=": lambda column, value: column >= value,
+        "<=": lambda column, value: column <= value,
+        ">": lambda column, value: column > value,
+        "<": lambda column, value: column < value,
+    }
+
+    predicates = []
+    for condition in conditions:
+        field, operator, value = parse_condition(condition)
+        predicates.append(
+            lambda df, field=field, compare=operators[operator], value=value: compare(
+                get_compared_column(df, field, value), value
+            )
+        )
+
+    return predicates
+
+
+def get_projection(table_config: dict) -> list:
+    """
+    Returns the columns to read for a table: its fields, plus `meta.action`
+    to detect deletion records, and any fields only used by its filter.
+
+    :param1 table_config (dict): The table's configuration.
+    :return: The list of columns to read.
+    """
+    fields = table_config.get("fields")
+    extra_fields = ["meta.action"] + [
+        parse_condition(condition)[0] for condition in table_config.get("filter") or []
+    ]
+    return fields + [field for field in dict.fromkeys(extra_fields) if field not in fields]
+
+
+def split_deletes(dataframes: dict) -> dict:
+    """
+    Moves the DAP deletion records out of each DataFrame into their own stream.
+
+    :param1 dataframes (dict): Dictionary of projected DataFrames, updated in place
+    to keep only the upserted records.
+    :return: Dictionary of DataFrames with only the `key.id` of each deleted record.
+    """
+    deletes = {}
+    for key, df in dataframes.items():
+        if "meta.action" not in df.columns:
+            continue
+
+        mask = df["meta.action"].isin(DELETE_ACTIONS)
+        if mask.any():
+            deletes[key] = df.loc[mask, ["key.id"]]
+            dataframes[key] = df[~mask]
+            logger.info(
+                "Split [%s] delete records from table [%s].", len(deletes[key]), key
+            )
+
+    return deletes
+
+
+def deduplicate_dataframes(dataframes: dict) -> dict:
+    """
+    Keeps only the newest record of each key in each DataFrame, the one with the
+    latest `meta.ts`, or the last one in the file when they tie. Multi-part downloads
+    are merged in download order, so the file order alone is not the record order.
+    Deletion records are included, so a key is only upserted or deleted, never both.
+
+    :param1 dataframes (dict): Dictionary of projected DataFrames.
+    :return: Dictionary of DataFrames with one record per key, in file order.
+    """
+    for key, df in dataframes.items():
+        if "key.id" not in df.columns:
+            continue
+
+        rows_before = len(df)
+        newest_df = df
+        if "meta.ts" in df.columns:
+            newest_df = df.sort_values("meta.ts", kind="stable", na_position="first")
+        dataframes[key] = newest_df.drop_duplicates(subset="key.id", keep="last").sort_index()
+        if len(dataframes[key]) < rows_before:
+            logger.info(
+                "Dropped [%s] duplicate key records from table [%s].",
+                rows_before - len(dataframes[key]),
+                key,
+            )
+
+    return dataframes
+
+
+def apply_filter(df: pd.DataFrame, table: str, conditions: list) -> pd.DataFrame:
+    """
+    Keeps only the rows of the DataFrame that match all of the table's filter conditions.
+
+    :param1 df (pd.DataFrame): The projected DataFrame.
+    :param2 table (str): The Canvas table, for logging.
+    :param3 conditions (list): The table's filter conditions from config.yml.
+    :return: The filtered DataFrame.
+    """
+    if not conditions:
+        return df
+
+    rows_before = len(df)
+    mask = pd.Series(True, index=df.index)
+    try:
+        for predicate in compile_filter(conditions):
+            mask &= predicate(df)
+    except KeyError as e:
+        logger.error("Filter for table [%s] uses a field that was not loaded: %s", table, e)
+        raise RuntimeError(f"Filter for table [{table}] uses a field that was not loaded: {e}") from e
+    df = df[mask]
+
+    logger.info(
+        "Filtered table [%s] from [%s] rows to [%s] rows.", table, rows_before, len(df)
+    )
+    return df
+
+
+def filter_dataframes(dataframes: dict, columns_mapping: dict, deletes: dict = None) -> dict:
+    """
+    Applies each table's filter to its DataFrame, then drops the columns that were
+    only read for the filter.
+
+    Rows that no longer match the filter may already be in Oracle from an earlier run,
+    e.g. an enrollment that went from `active` to `deleted`, so for tables with a
+    `db_delete` query their keys are added to the delete stream.
+
+    :param1 dataframes (dict): Dictionary of projected DataFrames.
+    :param2 columns_mapping (dict): A dictionary where keys are table names and values
+    are the table configurations.
+    :param3 deletes (dict): Dictionary of deleted keys DataFrames, updated in place.
+    :return: Dictionary of filtered DataFrames with only the configured fields.
+    """
+    for key, df in dataframes.items():
+        table_config = columns_mapping.get(key)
+        filtered_df = apply_filter(df, key, table_config.get("filter"))
+
+        if deletes is not None and table_config.get("db_delete") and len(filtered_df) < len(df):
+            excluded = df.drop(filtered_df.index)[["key.id"]]
+            deletes[key] = pd.concat([deletes.get(key), excluded])
+            logger.info(
+                "Routed [%s] filtered out keys of table [%s] to deletes.", len(excluded), key
+            )
+
+        dataframes[key] = filtered_df[
+            [col for col in table_config.get("fields") if col in filtered_df.columns]
+        ]
+
+    return dataframes
+
+
 def process_file(json_file: Path, dataframes: dict, columns_to_keep: list) -> None:
     """
     Helper function to process a single JSON file and store the DataFrame in the dictionary.
@@ -77,12 +327,185 @@ def load_and_process_json_files(directory: Path, columns_mapping: dict) -> dict:
 
     for json_file in json_files:
         stem = json_file.stem
-        columns_to_keep = columns_mapping.get(stem).get("fields")
+        columns_to_keep = get_projection(columns_mapping.get(stem))
         process_file(json_file, dataframes, columns_to_keep)
 
     return dataframes
 
 
+def unescape_tsv(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    """
+    Decodes the backslash escapes DAP writes in TSV string values for backslashes,
+    newlines, tabs and carriage returns.
+
+    :param1 column (pa.ChunkedArray): A string column read from a TSV file.
+    :return: The column with its escape sequences decoded.
+    """
+    # park escaped backslashes so they are not read as the start of another escape
+    column = pc.replace_substring(column, "\\\\", "\x00")
+    for escaped, character in (("\\n", "\n"), ("\\t", "\t"), ("\\r", "\r")):
+        column = pc.replace_substring(column, escaped, character)
+    return pc.replace_substring(column, "\x00", "\\")
+
+
+def get_temporal_fields(schema: pa.Schema, prefix: str = "") -> list:
+    """
+    Lists the fields Arrow inferred a date or time type for, by their flattened names.
+    DAP delivers them as text, so they are read again as strings.
+
+    :param1 schema (pa.Schema): The inferred schema, or the fields of a struct.
+    :param2 prefix (str): The flattened name of the parent struct.
+    :return: The flattened names of the date and time fields.
+    """
+    fields = []
+    for field in schema:
+        if pa.types.is_struct(field.type):
+            fields += get_temporal_fields(list(field.type), f"{prefix}{field.name}.")
+        elif pa.types.is_temporal(field.type):
+            fields.append(f"{prefix}{field.name}")
+
+    return fields
+
+
+def get_text_schema(fields: list) -> pa.Schema:
+    """
+    Builds a schema that types the given flattened fields as strings, with their
+    parent structs, for the JSON reader to infer every other field.
+
+    :param1 fields (list): The flattened names of the fields to read as strings.
+    :return: The partial schema.
+    """
+    tree = {}
+    for field in fields:
+        node = tree
+        for name in field.split("."):
+            node = node.setdefault(name, {})
+
+    def get_type(node: dict) -> pa.DataType:
+        if not node:
+            return pa.string()
+        return pa.struct([pa.field(name, get_type(child)) for name, child in node.items()])
+
+    return pa.schema([pa.field(name, get_type(child)) for name, child in tree.items()])
+
+
+def read_delimited_table(data_file: Path, columns_to_keep: list, data_format: str) -> pa.Table:
+    """
+    Reads a DAP CSV or TSV file (expanded mode) into an Arrow table with a multithreaded
+    reader that only materializes the selected columns.
+
+    Every field but `key.id` is read as the text DAP delivered, like in its JSON Lines
+    output, so identifiers like `0042` and dates are not re-typed from the values of the
+    first block. Fields that only hold `true` and `false` are read as booleans.
+
+    :param1 data_file (Path): The path to the CSV or TSV file.
+    :param2 columns_to_keep (list): The columns to keep for the table.
+    :param3 data_format (str): The format of the file: `csv` or `tsv`.
+    :return: An Arrow table with the selected columns.
+    """
+    if data_format == "tsv":
+        parse_options = pa_csv.ParseOptions(delimiter="\t", quote_char=False)
+        null_values = ["\\N"]
+    else:
+        parse_options = pa_csv.ParseOptions(delimiter=",", newlines_in_values=True)
+        null_values = [""]
+
+    table = pa_csv.read_csv(
+        data_file,
+        read_options=pa_csv.ReadOptions(use_threads=True, block_size=BLOCK_SIZE),
+        parse_options=parse_options,
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=columns_to_keep,
+            include_missing_columns=True,
+            null_values=null_values,
+            strings_can_be_null=True,
+            column_types={
+                col: pa.int64() if col == "key.id" else pa.string() for col in columns_to_keep
+            },
+        ),
+    )
+
+    for i, field in enumerate(table.schema):
+        if not pa.types.is_string(field.type):
+            continue
+
+        column = table.column(i)
+        if data_format == "tsv":
+            column = unescape_tsv(column)
+        if column.null_count < len(column) and pc.all(
+            pc.is_in(column.drop_null(), value_set=pa.array(BOOLEAN_TEXT))
+        ).as_py():
+            column = pc.equal(column, "true")
+        table = table.set_column(i, field.name, column)
+
+    return table
+
+
+def read_delimited_file(
+    data_file: Path, columns_to_keep: list, data_format: str
+) -> pd.DataFrame:
+    """
+    Reads a DAP CSV or TSV file (expanded mode) into a DataFrame, see `read_delimited_table`.
+
+    :param1 data_file (Path): The path to the CSV or TSV file.
+    :param2 columns_to_keep (list): The columns to keep for the table.
+    :param3 data_format (str): The format of the file: `csv` or `tsv`.
+    :return: A DataFrame with the selected columns.
+    """
+    return read_delimited_table(data_file, columns_to_keep, data_format).to_pandas()
+
+
+def load_and_process_delimited_files(
+    directory: Path, columns_mapping: dict, data_format: str
+) -> dict:
+    """
+    Reads all CSV or TSV files in the specified directory into DataFrames,
+    selecting only the specified columns.
+
+    :param1 directory (Path): The path to the directory containing CSV or TSV files.
+    :param2 columns_mapping (dict): A dictionary where keys are file name stems
+    and values are lists of columns to keep.
+    :param3 data_format (str): The format of the files: `csv` or `tsv`.
+    :return: A dictionary where keys are the file name stems and values are
+    filtered DataFrames.
+    """
+    if not directory.is_dir():
+        logger.error("The path %s is not a valid directory.", directory)
+        raise ValueError(f"The path {directory} is not a valid directory.")
+
+    data_files = list(directory.glob(f"*.{data_format}"))
+
+    if not data_files:
+        logger.error("No %s files found in directory: %s", data_format.upper(), directory)
+        raise FileNotFoundError(
+            f"No {data_format.upper()} files found in directory: {directory}"
+        )
+
+    dataframes = {}
+
+    for data_file in data_files:
+        stem = data_file.stem
+        columns_to_keep = get_projection(columns_mapping.get(stem))
+        try:
+            df = read_delimited_file(data_file, columns_to_keep, data_format)
+        except Exception as e:
+            logger.error("Failed to process file %s. Error: %s", data_file, e)
+            raise RuntimeError(f"Failed to process file {data_file}") from e
+
+        if not df.empty:
+            dataframes[stem] = df
+            logger.info(
+                "Loaded %s file %s into DataFrame with key: %s.",
+                data_format.upper(),
+                data_file,
+                stem,
+            )
+        else:
+            logger.warning("No data loaded from %s.", data_file)
+
+    return dataframes
+
+
 def rename_dataframe_columns(dataframes: dict) -> dict:
     """
     Renames columns in each DataFrame in the dictionary to include the DataFrame's key as a prefix.
@@ -125,37 +548,421 @@ def rename_dataframe_columns(dataframes: dict) -> dict:
     return dataframes
 
 
-def export_to_final(user_config: dict, dataframes: dict):
+def export_to_final(user_config: dict, dataframes: dict, final_path: Path = None):
     """
-    Exports a list of dataframes into CSV files in the final data directory.
+    Exports a list of dataframes into CSV or Arrow IPC (Feather) files in the final data directory.
+
+    Arrow files are written uncompressed, with record batches sized to the configured
+    batch size, so the uploader can memory-map them and bind each record batch directly.
 
     :param1 user_config (dict): The user config.
     :param2 dataframes (dict): Dataframes to be exported.
+    :param3 final_path (Path): The directory to export to, defaults to the final data directory.
     """
-    user_config.final_path.mkdir(parents=True, exist_ok=True)
+    final_path = final_path or user_config.final_path
+    final_path.mkdir(parents=True, exist_ok=True)
 
     for key, df in dataframes.items():
-        final_dir = user_config.final_path / f"{key}.csv"
-        df.to_csv(final_dir, index=False, encoding="utf-8")
+        final_dir = final_path / f"{key}.{user_config.final_format}"
+        if user_config.final_format == "arrow":
+            # the row index is not a field, and the uploader binds every column in order
+            feather.write_feather(
+                pa.Table.from_pandas(df, preserve_index=False),
+                final_dir,
+                compression="uncompressed",
+                chunksize=user_config.batch_size,
+            )
+        else:
+            df.to_csv(final_dir, index=False, encoding="utf-8")
         logger.info("%s created successfully.", final_dir)
 
 
+class PandasEngine:
+    """
+    The default transform engine, on pandas DataFrames.
+    """
+
+    def load(self, data_path: Path, columns_mapping: dict, data_format: str) -> dict:
+        """
+        Loads the data files of the given format into DataFrames of the projected columns.
+
+        :param1 data_path (Path): The directory of the data files.
+        :param2 columns_mapping (dict): The table configurations, keyed by table.
+        :param3 data_format (str): The format of the files: `jsonl`, `csv` or `tsv`.
+        :return: Dictionary of DataFrames, keyed by table.
+        """
+        if data_format == "jsonl":
+            return load_and_process_json_files(data_path, columns_mapping)
+        return load_and_process_delimited_files(data_path, columns_mapping, data_format)
+
+    def split_deletes(self, tables: dict) -> dict:
+        """
+        See `split_deletes`.
+        """
+        return split_deletes(tables)
+
+    def deduplicate(self, tables: dict) -> dict:
+        """
+        See `deduplicate_dataframes`.
+        """
+        return deduplicate_dataframes(tables)
+
+    def filter(self, tables: dict, columns_mapping: dict, deletes: dict = None) -> dict:
+        """
+        See `filter_dataframes`.
+        """
+        return filter_dataframes(tables, columns_mapping, deletes)
+
+    def rename(self, tables: dict) -> dict:
+        """
+        See `rename_dataframe_columns`.
+        """
+        return rename_dataframe_columns(tables)
+
+    def export(self, user_config: dict, tables: dict, final_path: Path = None) -> None:
+        """
+        See `export_to_final`.
+        """
+        export_to_final(user_config, tables, final_path)
+
+
+class ArrowEngine:
+    """
+    The Arrow transform engine. Tables stay Arrow tables from the reader to the final
+    files, and projection, filtering, deduplication and renaming run as vectorized,
+    multithreaded Arrow kernels. JSON Lines columns keep the types Arrow inferred, so
+    integers with nulls stay integers.
+    """
+
+    # the comparison of each filter operator, and whether it keeps rows with a null field
+    OPERATORS = {
+        "in": (
+            lambda column, value: pc.is_in(column, value_set=pa.array(value).cast(column.type)),
+            False,
+        ),
+        "not in": (
+            lambda column, value: pc.invert(
+                pc.is_in(column, value_set=pa.array(value).cast(column.type))
+            ),
+            True,
+        ),
+        "==": (pc.equal, False),
+        "!=": (pc.not_equal, True),
+        ">=": (pc.greater_equal, False),
+        "<=": (pc.less_equal, False),
+        ">": (pc.greater, False),
+        "<": (pc.less, False),
+    }
+
+    def read_json_table(self, json_file: Path, columns_to_keep: list) -> pa.Table:
+        """
+        Reads a DAP JSON Lines file with the multithreaded Arrow reader, flattens
+        its nested records, and selects only the specified columns.
+
+        JSON has no date or time types, so the fields Arrow infers one for, like
+        `2024-01-01`, are read again as strings to keep the text DAP delivered.
+
+        :param1 json_file (Path): The path to the JSON file.
+        :param2 columns_to_keep (list): The columns to keep for the table.
+        :return: An Arrow table with the selected columns.
+        """
+        read_options = pa_json.ReadOptions(use_threads=True, block_size=BLOCK_SIZE)
+
+        # types are inferred per block, start with the fields of the first one
+        with pa_json.open_json(json_file, read_options=read_options) as reader:
+            text_fields = set(get_temporal_fields(reader.schema))
+
+        while True:
+            table = pa_json.read_json(
+                json_file,
+                read_options=read_options,
+                parse_options=pa_json.ParseOptions(
+                    explicit_schema=get_text_schema(sorted(text_fields)),
+                    unexpected_field_behavior="infer",
+                ),
+            )
+            while any(pa.types.is_struct(field.type) for field in table.schema):
+                table = table.flatten()
+
+            table = table.select([col for col in columns_to_keep if col in table.column_names])
+            temporal_fields = get_temporal_fields(table.schema)
+            if not temporal_fields:
+                return table
+            text_fields.update(temporal_fields)
+
+    def load(self, data_path: Path, columns_mapping: dict, data_format: str) -> dict:
+        """
+        Loads the data files of the given format into Arrow tables of the projected columns.
+
+        :param1 data_path (Path): The directory of the data files.
+        :param2 columns_mapping (dict): The table configurations, keyed by table.
+        :param3 data_format (str): The format of the files: `jsonl`, `csv` or `tsv`.
+        :return: Dictionary of Arrow tables, keyed by table.
+        """
+        if not data_path.is_dir():
+            logger.error("The path %s is not a valid directory.", data_path)
+            raise ValueError(f"The path {data_path} is not a valid directory.")
+
+        extension = "json" if data_format == "jsonl" else data_format
+        data_files = list(data_path.glob(f"*.{extension}"))
+
+        if not data_files:
+            logger.error("No %s files found in directory: %s", extension.upper(), data_path)
+            raise FileNotFoundError(
+                f"No {extension.upper()} files found in directory: {data_path}"
+            )
+
+        tables = {}
+        for data_file in data_files:
+            stem = data_file.stem
+            columns_to_keep = get_projection(columns_mapping.get(stem))
+            if data_file.stat().st_size == 0:
+                logger.warning("No data loaded from %s.", data_file)
+                continue
+
+            try:
+                if data_format == "jsonl":
+                    table = self.read_json_table(data_file, columns_to_keep)
+                else:
+                    table = read_delimited_table(data_file, columns_to_keep, data_format)
+            except Exception as e:
+                logger.error("Failed to process file %s. Error: %s", data_file, e)
+                raise RuntimeError(f"Failed to process file {data_file}") from e
+
+            if table.num_rows:
+                tables[stem] = table
+                logger.info(
+                    "Loaded %s file %s into Arrow table with key: %s.",
+                    extension.upper(),
+                    data_file,
+                    stem,
+                )
+            else:
+                logger.warning("No data loaded from %s.", data_file)
+
+        return tables
+
+    def split_deletes(self, tables: dict) -> dict:
+        """
+        Moves the DAP deletion records out of each table into their own stream.
+
+        :param1 tables (dict): Dictionary of projected Arrow tables, updated in place
+        to keep only the upserted records.
+        :return: Dictionary of Arrow tables with only the `key.id` of each deleted record.
+        """
+        deletes = {}
+        for key, table in tables.items():
+            if "meta.action" not in table.column_names:
+                continue
+
+            mask = pc.fill_null(
+                pc.is_in(table["meta.action"], value_set=pa.array(DELETE_ACTIONS)), False
+            )
+            if pc.any(mask).as_py():
+                deletes[key] = table.filter(mask).select(["key.id"])
+                tables[key] = table.filter(pc.invert(mask))
+                logger.info(
+                    "Split [%s] delete records from table [%s].", deletes[key].num_rows, key
+                )
+
+        return deletes
+
+    def deduplicate(self, tables: dict) -> dict:
+        """
+        Keeps only the newest record of each key in each table, like
+        `deduplicate_dataframes`: the one with the latest `meta.ts`, or the last one
+        in the file when they tie.
+
+        :param1 tables (dict): Dictionary of projected Arrow tables.
+        :return: Dictionary of Arrow tables with one record per key, in file order.
+        """
+        for key, table in tables.items():
+            if "key.id" not in table.column_names:
+                continue
+
+            sort_keys = [("key.id", "ascending")]
+            columns = {"key.id": table["key.id"], "row": np.arange(table.num_rows)}
+            if "meta.ts" in table.column_names:
+                # records without a timestamp sort before the ones with one, like pandas
+                sort_keys += [("has_ts", "ascending"), ("meta.ts", "ascending")]
+                columns["has_ts"] = pc.is_valid(table["meta.ts"])
+                columns["meta.ts"] = table["meta.ts"]
+            sort_keys.append(("row", "ascending"))
+
+            # the newest record of each key is the last of its run in the sorted rows
+            records = pa.table(columns).sort_by(sort_keys)
+            keys = records["key.id"].to_numpy()
+            newest = np.append(keys[1:] != keys[:-1], True)
+            rows = np.sort(records["row"].to_numpy()[newest])
+
+            if len(rows) < table.num_rows:
+                tables[key] = table.take(rows)
+                logger.info(
+                    "Dropped [%s] duplicate key records from table [%s].",
+                    table.num_rows - len(rows),
+                    key,
+                )
+
+        return tables
+
+    def filter(self, tables: dict, columns_mapping: dict, deletes: dict = None) -> dict:
+        """
+        Applies each table's filter to its Arrow table, then drops the columns that were
+        only read for the filter. Rows are matched like `apply_filter` matches them, and
+        the keys of filtered out rows are routed to deletes like `filter_dataframes` does.
+
+        :param1 tables (dict): Dictionary of projected Arrow tables.
+        :param2 columns_mapping (dict): A dictionary where keys are table names and values
+        are the table configurations.
+        :param3 deletes (dict): Dictionary of deleted keys Arrow tables, updated in place.
+        :return: Dictionary of filtered Arrow tables with only the configured fields.
+        """
+        for key, table in tables.items():
+            table_config = columns_mapping.get(key)
+            conditions = table_config.get("filter")
+
+            if conditions:
+                rows_before = table.num_rows
+                mask = None
+                try:
+                    for condition in conditions:
+                        field, operator, value = parse_condition(condition)
+                        compare, keep_nulls = self.OPERATORS[operator]
+                        column = table[field]
+                        if is_numeric_condition(value) and pa.types.is_string(column.type):
+                            # numbers read as text from CSV and TSV files
+                            column = pc.cast(column, pa.float64())
+                        if pa.types.is_null(column.type):
+                            # a field that is null in every record of the pull
+                            matches = pa.array(np.full(table.num_rows, keep_nulls))
+                        else:
+                            matches = pc.fill_null(compare(column, value), keep_nulls)
+                        mask = matches if mask is None else pc.and_(mask, matches)
+                except KeyError as e:
+                    logger.error("Filter for table [%s] uses a field that was not loaded: %s", key, e)
+                    raise RuntimeError(f"Filter for table [{key}] uses a field that was not loaded: {e}") from e
+                if deletes is not None and table_config.get("db_delete"):
+                    excluded = table.filter(pc.invert(mask)).select(["key.id"])
+                    if excluded.num_rows:
+                        deletes[key] = pa.concat_tables(
+                            [deletes[key], excluded] if key in deletes else [excluded],
+                            promote_options="default",
+                        )
+                        logger.info(
+                            "Routed [%s] filtered out keys of table [%s] to deletes.",
+                            excluded.num_rows,
+                            key,
+                        )
+                table = table.filter(mask)
+
+                logger.info(
+                    "Filtered table [%s] from [%s] rows to [%s] rows.",
+                    key,
+                    rows_before,
+                    table.num_rows,
+                )
+
+            tables[key] = table.select(
+                [col for col in table_config.get("fields") if col in table.column_names]
+            )
+
+        return tables
+
+    def rename(self, tables: dict) -> dict:
+        """
+        Renames the columns of each Arrow table to include the table's key as a prefix,
+        like `rename_dataframe_columns`.
+
+        :param1 tables (dict): Dictionary of Arrow tables to have their columns renamed.
+        :return: Dictionary of Arrow tables with renamed columns.
+        """
+        for key, table in tables.items():
+            tables[key] = table.rename_columns(
+                [f"{key}_{column.split('.', 1)[-1]}" for column in table.column_names]
+            )
+
+        return tables
+
+    def export(self, user_config: dict, tables: dict, final_path: Path = None) -> None:
+        """
+        Exports the Arrow tables into CSV or Arrow IPC (Feather) files in the final data
+        directory, like `export_to_final`. Booleans are written to CSV files as `True` and
+        `False`, as pandas writes them.
+
+        :param1 user_config (dict): The user config.
+        :param2 tables (dict): Arrow tables to be exported.
+        :param3 final_path (Path): The directory to export to, defaults to the final data directory.
+        :return: None
+        """
+        final_path = final_path or user_config.final_path
+        final_path.mkdir(parents=True, exist_ok=True)
+
+        for key, table in tables.items():
+            final_dir = final_path / f"{key}.{user_config.final_format}"
+            if user_config.final_format == "arrow":
+                feather.write_feather(
+                    table,
+                    final_dir,
+                    compression="uncompressed",
+                    chunksize=user_config.batch_size,
+                )
+            else:
+                for i, field in enumerate(table.schema):
+                    if pa.types.is_boolean(field.type):
+                        column = pc.if_else(table.column(i), "True", "False")
+                        table = table.set_column(i, field.name, column)
+                pa_csv.write_csv(table, final_dir)
+            logger.info("%s created successfully.", final_dir)
+
+
+def get_engine(user_config: dict):
+    """
+    Returns the transform engine selected by `transform_engine`.
+
+    :param1 user_config (dict): The user config.
+    :return: A `PandasEngine` or an `ArrowEngine`.
+    """
+    if user_config.transform_engine == "arrow":
+        return ArrowEngine()
+    return PandasEngine()
+
+
 def main(user_config: dict) -> dict:
     """
-    Main function to load and process JSON files into DataFrames.
+    Main function to load and process JSON, CSV or TSV files into DataFrames,
+    or into Arrow tables with the Arrow engine.
 
-    :return: A dictionary of DataFrames processed from JSON files.
+    :return: A dictionary of DataFrames or Arrow tables processed from the data files.
     """
-    # load and process JSON files into DataFrames
-    if user_config.str_format.lower() == "jsonl":
-        json_path = user_config.temp_path / user_config.str_format.lower()
-        dataframes = load_and_process_json_files(json_path, user_config.canvas_tables)
+    engine = get_engine(user_config)
+    data_format = user_config.str_format.lower()
+    data_path = user_config.temp_path / data_format
+
+    # load and process JSON, CSV or TSV files into DataFrames
+    if data_format not in {"jsonl", "csv", "tsv"}:
+        logger.error("Canvas format %s is not supported by the transformer.", data_format)
+        raise ValueError(f"Canvas format {data_format} is not supported by the transformer.")
+    dataframes = engine.load(data_path, user_config.canvas_tables, data_format)
+
+    # keep only the latest record of each key, whether it is an upsert or a delete,
+    # since the uploader applies the deletes after the upserts
+    dataframes = engine.deduplicate(dataframes)
+
+    # split the deletion records into their own stream, they are never filtered
+    deletes = engine.split_deletes(dataframes)
+
+    # drop the rows excluded by each table's filter before any CSV or Oracle work
+    # and route the keys of rows that moved out of the filter to the deletes
+    dataframes = engine.filter(dataframes, user_config.canvas_tables, deletes)
 
     # rename the selected dataframe columns for further processing
-    dataframes = rename_dataframe_columns(dataframes)
+    dataframes = engine.rename(dataframes)
+    deletes = engine.rename(deletes)
 
-    # save CSV files to data/final
-    export_to_final(user_config, dataframes)
+    # save CSV or Arrow files to data/final, and the deleted keys to data/final/deletes
+    engine.export(user_config, dataframes)
+    utils.empty_temp(user_config.final_path / "deletes")
+    engine.export(user_config, deletes, user_config.final_path / "deletes")
 
     return dataframes
 
@@ -1,102 +1,796 @@
 """
-Uses predefined SQL statements to merge pulled records from Canvas CSV files into
-predefined Oracle tables.
+Uses predefined SQL statements to merge pulled records from Canvas CSV or Arrow files into
+predefined Oracle tables. The tables of every Canvas instance are loaded concurrently
+through one shared Oracle connection pool.
 """
 
 import csv
+import itertools
+import json
 import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Iterator
+import numpy as np
 import oracledb
+import pyarrow as pa
+import pyarrow.compute as pc
+import key_index
 import config
 
 logger = logging.getLogger(__name__)
 
+# the Oracle connection pool shared by the loader threads, see `create_pool`
+pool = None
 
-def update_table_with_csv(user_config: dict, csv_file: Path) -> None:
+
+def read_csv_batches(
+    csv_file: Path, num_columns: int, batch_size: int, offset: int = 0
+) -> Iterator[list]:
+    """
+    Reads the CSV file and yields lists of bind tuples of at most `batch_size` rows.
+
+    :param1 csv_file (Path): The Path to the CSV file.
+    :param2 num_columns (int): The number of columns bound in the merge query.
+    :param3 batch_size (int): The maximum number of rows per batch.
+    :param4 offset (int): The number of data rows to skip, e.g. when resuming from a checkpoint.
+    :return: An iterator of lists of bind tuples.
+    """
+
+    with open(csv_file, "r", encoding="utf-8", newline="") as csv_stream:
+        csv_reader = csv.reader(csv_stream, delimiter=",")
+
+        # skip the header row and any rows already committed
+        next(csv_reader)
+        csv_reader = itertools.islice(csv_reader, offset, None)
+
+        data = []
+        for line in csv_reader:
+            data.append(tuple(line[:num_columns]))
+            if len(data) % batch_size == 0:
+                yield data
+                data = []
+        if data:
+            yield data
+
+
+def to_binds(column: pa.Array) -> list:
+    """
+    Converts an Arrow column to the values bound for it, see `read_arrow_batches`.
+
+    :param1 column (pa.Array): A column of a record batch.
+    :return: The list of bind values, with nulls as None.
+    """
+    if pa.types.is_boolean(column.type):
+        return pc.if_else(column, "True", "False").to_pylist()
+    return column.to_pylist()
+
+
+def read_arrow_batches(
+    arrow_file: Path, num_columns: int, batch_size: int, offset: int = 0
+) -> Iterator[list]:
     """
-    Update or insert records from the CSV file into the database table.
+    Memory-maps the Arrow IPC (Feather) file and yields lists of bind tuples of at most
+    `batch_size` rows. Columns are converted a record batch at a time, so no file parsing
+    or per-row Python loop is needed. Booleans are bound as the `True` and `False` text
+    the CSV final files hold, so both final formats load the same values.
+
+    :param1 arrow_file (Path): The Path to the Arrow file.
+    :param2 num_columns (int): The number of columns bound in the merge query.
+    :param3 batch_size (int): The maximum number of rows per batch.
+    :param4 offset (int): The number of data rows to skip, e.g. when resuming from a checkpoint.
+    :return: An iterator of lists of bind tuples.
+    """
+
+    with pa.memory_map(str(arrow_file), "r") as source:
+        reader = pa.ipc.open_file(source)
+
+        for i in range(reader.num_record_batches):
+            record_batch = reader.get_batch(i)
+
+            # skip record batches, or the start of one, that were already committed
+            if offset >= record_batch.num_rows:
+                offset -= record_batch.num_rows
+                continue
+            record_batch = record_batch.slice(offset)
+            offset = 0
+
+            for start in range(0, record_batch.num_rows, batch_size):
+                chunk = record_batch.slice(start, batch_size)
+                columns = [to_binds(chunk.column(j)) for j in range(num_columns)]
+                yield list(zip(*columns))
+
+
+def create_pool(user_config: dict) -> oracledb.ConnectionPool:
+    """
+    Creates the Oracle connection pool shared by the loader threads, sized by `db_pool_size`.
 
     :param1 user_config (dict): The user config.
-    :param2 csv_fiel (Path): The Path to the csv_file.
-    :return: None
+    :return: An Oracle connection pool.
     """
 
-    sql = user_config.canvas_tables.get(csv_file.stem).get("db_query")
-    num_columns = len(user_config.canvas_tables.get(csv_file.stem).get("fields"))
+    return oracledb.create_pool(
+        user=user_config.db_username,
+        password=user_config.db_password,
+        host=user_config.db_host,
+        port=user_config.db_port,
+        service_name=user_config.db_service,
+        min=1,
+        max=user_config.db_pool_size,
+        increment=1,
+    )
+
+
+def get_connection(user_config: dict) -> oracledb.Connection:
+    """
+    Opens a connection to the Oracle database, from the shared pool if one is open.
+    Closing a pooled connection releases it back to the pool.
+
+    :param1 user_config (dict): The user config.
+    :return: An Oracle database connection.
+    """
+
+    if pool is not None:
+        return pool.acquire()
 
-    with oracledb.connect(
+    return oracledb.connect(
         user=user_config.db_username,
         password=user_config.db_password,
         host=user_config.db_host,
         port=user_config.db_port,
         service_name=user_config.db_service,
-    ) as connection:
+    )
+
+
+def get_run_id(final_file: Path) -> str:
+    """
+    Identifies a final data file, so checkpoints are only resumed for the same file.
+
+    :param1 final_file (Path): The Path to the final data file.
+    :return: The run identifier.
+    """
+    stat = final_file.stat()
+    return f"{final_file.name}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def append_keys(keys_file: Path, keys: set) -> None:
+    """
+    Durably appends keys to a keys file, one JSON value per line.
+
+    :param1 keys_file (Path): The Path to the keys file.
+    :param2 keys (set): The keys to append.
+    :return: None
+    """
+    keys_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(keys_file, "a", encoding="utf-8") as keys_stream:
+        keys_stream.writelines(f"{json.dumps(key)}\n" for key in keys)
+        keys_stream.flush()
+        os.fsync(keys_stream.fileno())
+
+
+def read_keys(keys_file: Path) -> set:
+    """
+    Reads the keys of a keys file written by `append_keys`.
+
+    :param1 keys_file (Path): The Path to the keys file.
+    :return: The set of keys, empty if the file does not exist.
+    """
+    if not keys_file.is_file():
+        return set()
+
+    lines = keys_file.read_text(encoding="utf-8").splitlines()
+    return set(json.loads(line) for line in lines if line)
+
+
+def read_checkpoint(user_config: dict, table: str, run_id: str) -> tuple:
+    """
+    Reads the table's upload checkpoint if it belongs to the given run.
+
+    :param1 user_config (dict): The user config.
+    :param2 table (str): The Canvas table.
+    :param3 run_id (str): The run identifier of the final data file.
+    :return: A tuple of (committed row offset, set of committed changed keys).
+    """
+    checkpoint_file = user_config.state_path / "checkpoints" / f"{table}.json"
+    keys_file = checkpoint_file.with_suffix(".keys")
+
+    if not checkpoint_file.is_file():
+        return 0, set()
+
+    checkpoint = json.loads(checkpoint_file.read_text(encoding="utf-8"))
+    if checkpoint.get("run_id") != run_id:
+        logger.info("Discarding stale checkpoint for table [canvas_%s].", table)
+        clear_checkpoint(user_config, table)
+        return 0, set()
+
+    touched_keys = read_keys(keys_file)
+
+    logger.info(
+        "Resuming table [canvas_%s] from checkpoint at row offset [%s].",
+        table,
+        checkpoint.get("offset"),
+    )
+    return checkpoint.get("offset"), touched_keys
+
+
+def write_checkpoint(
+    user_config: dict, table: str, run_id: str, offset: int, new_keys: set
+) -> None:
+    """
+    Durably records the committed row offset and changed keys for the table's run.
+
+    :param1 user_config (dict): The user config.
+    :param2 table (str): The Canvas table.
+    :param3 run_id (str): The run identifier of the final data file.
+    :param4 offset (int): The number of data rows committed.
+    :param5 new_keys (set): The changed keys committed since the last checkpoint.
+    :return: None
+    """
+    checkpoint_dir = user_config.state_path / "checkpoints"
+    checkpoint_dir.mkdir(parents=True, exist_ok=True)
+    checkpoint_file = checkpoint_dir / f"{table}.json"
+
+    # the keys file may only get ahead of the checkpoint, which is harmless
+    append_keys(checkpoint_file.with_suffix(".keys"), new_keys)
+
+    temp_file = checkpoint_file.with_suffix(".tmp")
+    with open(temp_file, "w", encoding="utf-8") as checkpoint_stream:
+        json.dump({"run_id": run_id, "offset": offset}, checkpoint_stream)
+        checkpoint_stream.flush()
+        os.fsync(checkpoint_stream.fileno())
+    os.replace(temp_file, checkpoint_file)
+
+
+def clear_checkpoint(user_config: dict, table: str) -> None:
+    """
+    Removes the table's upload checkpoint once its run has completed.
+
+    :param1 user_config (dict): The user config.
+    :param2 table (str): The Canvas table.
+    :return: None
+    """
+    checkpoint_file = user_config.state_path / "checkpoints" / f"{table}.json"
+    checkpoint_file.unlink(missing_ok=True)
+    checkpoint_file.with_suffix(".keys").unlink(missing_ok=True)
+
+
+def write_pending_keys(user_config: dict, table: str, keys: set) -> None:
+    """
+    Records the committed changed keys of a table until the aggregate refresh that
+    uses them commits, so a failed run's keys are replayed by the next run.
+
+    :param1 user_config (dict): The user config.
+    :param2 table (str): The Canvas table.
+    :param3 keys (set): The changed keys committed for the table.
+    :return: None
+    """
+    append_keys(user_config.state_path / "aggregates" / f"{table}.keys", keys)
+
+
+def read_pending_keys(user_config: dict) -> dict:
+    """
+    Reads the changed keys that have not been refreshed into the aggregates yet,
+    including those of earlier runs that failed.
+
+    :param1 user_config (dict): The user config.
+    :return: The pending keys, keyed by Canvas table.
+    """
+    pending_dir = user_config.state_path / "aggregates"
+    if not pending_dir.is_dir():
+        return {}
+
+    return {keys_file.stem: read_keys(keys_file) for keys_file in pending_dir.glob("*.keys")}
+
+
+def clear_pending_keys(user_config: dict) -> None:
+    """
+    Removes the pending changed keys once the aggregate refresh has committed.
+
+    :param1 user_config (dict): The user config.
+    :return: None
+    """
+    pending_dir = user_config.state_path / "aggregates"
+    for keys_file in pending_dir.glob("*.keys"):
+        keys_file.unlink()
+
+
+def write_dead_letters(
+    user_config: dict, name: str, fields: list, data: list, errors: list, offset: int
+) -> None:
+    """
+    Appends the rows rejected by the database to the dead-letter file with the given name.
+
+    :param1 user_config (dict): The user config.
+    :param2 name (str): The name of the dead-letter file, e.g. the Canvas table.
+    :param3 fields (list): The fields of the bind tuples, for the file's header.
+    :param4 data (list): The batch of bind tuples.
+    :param5 errors (list): The batch errors, as (row index in the batch, error) tuples.
+    :param6 offset (int): The row offset of the batch in the final data file.
+    :return: None
+    """
+    user_config.dead_letter_path.mkdir(parents=True, exist_ok=True)
+    dead_letter_file = user_config.dead_letter_path / f"{name}.csv"
+    write_header = not dead_letter_file.is_file()
+
+    with open(dead_letter_file, "a", encoding="utf-8", newline="") as dead_letter_stream:
+        csv_writer = csv.writer(dead_letter_stream)
+        if write_header:
+            csv_writer.writerow(["error", "row_offset"] + fields)
+
+        for index, error in errors:
+            logger.error(
+                "Table [canvas_%s] error %s at row offset %s",
+                name,
+                error.message,
+                offset + index,
+            )
+            csv_writer.writerow([error.message, offset + index] + list(data[index]))
+
+    logger.warning(
+        "Table [canvas_%s] wrote [%s] rejected rows to %s.",
+        name,
+        len(errors),
+        dead_letter_file,
+    )
+
+
+def bind_order(sql: str) -> list | None:
+    """
+    Finds the order in which the numbered binds (`:1`, `:2`, ...) appear in the statement.
+    Positional binds are matched by order of appearance, so statements like an UPDATE,
+    which binds the key last, need their bind tuples reordered.
+
+    :param1 sql (str): The SQL statement.
+    :return: The zero-based field index of each bind in order, or None if no reorder is needed.
+    """
+    order = [int(bind) - 1 for bind in re.findall(r":(\d+)", re.sub(r"'[^']*'", "", sql))]
+    return None if order == list(range(len(order))) else order
+
+
+def execute_batch(cursor, sql: str, rows: list) -> tuple:
+    """
+    Executes the statement for a batch of bind tuples.
+
+    :param1 cursor: An Oracle database cursor.
+    :param2 sql (str): The SQL statement.
+    :param3 rows (list): The bind tuples, in field order.
+    :return: A tuple of (row counts, batch errors as (row index, error) tuples).
+    """
+    order = bind_order(sql)
+    if order is not None:
+        rows = [tuple(row[i] for i in order) for row in rows]
+
+    cursor.executemany(sql, rows, batcherrors=True, arraydmlrowcounts=True)
+    errors = [(error.offset, error) for error in cursor.getbatcherrors()]
+    return cursor.getarraydmlrowcounts(), errors
+
+
+def load_batch(
+    cursor, table_config: dict, data: list, index: key_index.KeyIndex | None
+) -> tuple:
+    """
+    Loads a batch of bind tuples into the table.
+
+    Without a key index, the whole batch goes through the table's MERGE query. With one,
+    rows with unseen keys are sent to the `db_insert` array INSERT, rows with known keys to
+    the `db_update` array UPDATE, and rows that hit a duplicate key on insert, because the
+    index was behind, fall back to the MERGE query. A known key that no row was updated for
+    is not newer than the Oracle row, so it is not retried.
+
+    :param1 cursor: An Oracle database cursor.
+    :param2 table_config (dict): The table's configuration.
+    :param3 data (list): The batch of bind tuples.
+    :param4 index (KeyIndex): The table's key index, or None.
+    :return: A tuple of (row counts, batch errors as (row index in the batch, error) tuples).
+    """
+    if index is None:
+        return execute_batch(cursor, table_config.get("db_query"), data)
+
+    known = index.contains([row[0] for row in data])
+    row_counts = [0] * len(data)
+    errors = []
+    retries = []
+
+    for sql, positions in (
+        (table_config.get("key_index").get("db_insert"), np.flatnonzero(~known)),
+        (table_config.get("key_index").get("db_update"), np.flatnonzero(known)),
+    ):
+        if not len(positions):
+            continue
+
+        counts, batch_errors = execute_batch(cursor, sql, [data[i] for i in positions])
+        for i, error in batch_errors:
+            # ORA-00001: the key already exists, so the index was behind
+            if error.code == 1:
+                retries.append(int(positions[i]))
+            else:
+                errors.append((int(positions[i]), error))
+
+        for i, count in enumerate(counts):
+            row_counts[positions[i]] = count
+
+    if retries:
+        counts, batch_errors = execute_batch(
+            cursor, table_config.get("db_query"), [data[i] for i in retries]
+        )
+        for i, count in enumerate(counts):
+            row_counts[retries[i]] = count
+        errors.extend((retries[i], error) for i, error in batch_errors)
+
+    return row_counts, errors
+
+
+def delete_keys(
+    cursor,
+    user_config: dict,
+    table: str,
+    delete_batches: Iterator[list],
+    index: key_index.KeyIndex | None,
+) -> set:
+    """
+    Deletes batches of keys from the database table with the table's `db_delete` query.
+
+    :param1 cursor: An Oracle database cursor.
+    :param2 user_config (dict): The user config.
+    :param3 table (str): The Canvas table the keys belong to.
+    :param4 delete_batches (Iterator[list]): An iterator of lists of (key,) bind tuples.
+    :param5 index (KeyIndex): The table's key index, or None.
+    :return: The set of keys of the rows that were deleted.
+    """
+    sql = user_config.canvas_tables.get(table).get("db_delete")
+    if sql is None:
+        logger.warning(
+            "Table [canvas_%s] has delete records but no 'db_delete' query, skipping deletes.",
+            table,
+        )
+        return set()
+
+    offset = 0
+    records_deleted = 0
+    deleted_keys = set()
+    for data in delete_batches:
+        row_counts, errors = execute_batch(cursor, sql, data)
+        records_deleted += sum(row_counts)
+        deleted_keys.update(row[0] for row, count in zip(data, row_counts) if count)
+
+        if errors:
+            write_dead_letters(user_config, f"{table}_deletes", ["key.id"], data, errors, offset)
+
+        if index is not None:
+            index.remove([row[0] for row in data])
+        offset += len(data)
+
+    logger.info("Table [canvas_%s] had [%s] rows deleted.", table, records_deleted)
+    return deleted_keys
+
+
+def update_table(
+    user_config: dict,
+    table: str,
+    batches: Iterator[list],
+    run_id: str = None,
+    offset: int = 0,
+    touched_keys: set = None,
+    delete_batches: Iterator[list] = None,
+    use_index: bool = True,
+) -> set:
+    """
+    Update or insert batches of records into the database table, then delete
+    the table's deleted keys in the same transaction.
+
+    With a `commit_interval`, the work is committed every `commit_interval` batches and,
+    for a given `run_id`, a checkpoint of the committed row offset is recorded so a
+    failed upload can resume from it. Rows rejected by the database are written to the
+    table's dead-letter file after each batch.
+
+    :param1 user_config (dict): The user config.
+    :param2 table (str): The Canvas table the records belong to.
+    :param3 batches (Iterator[list]): An iterator of lists of bind tuples.
+    :param4 run_id (str): The run identifier of the final data file, None to skip checkpoints.
+    :param5 offset (int): The row offset of the first batch in the final data file.
+    :param6 touched_keys (set): The changed keys already committed by a previous attempt.
+    :param7 delete_batches (Iterator[list]): An iterator of lists of (key,) bind tuples to delete.
+    :param8 use_index (bool): Whether to route rows through the table's key index, if it has one.
+    :return: The set of keys of the rows that were updated, inserted or deleted.
+    """
+
+    table_config = user_config.canvas_tables.get(table)
+    touched_keys = touched_keys or set()
+
+    with get_connection(user_config) as connection:
 
         with connection.cursor() as cursor:
 
-            with open(csv_file, "r", encoding="utf-8") as csv_stream:
-                csv_reader = csv.reader(csv_stream, delimiter=",")
+            index = None
+            if table_config.get("key_index") and use_index:
+                index = key_index.KeyIndex(user_config, table)
+                index.load(cursor)
 
-                # skip the header row
-                next(csv_reader)
+            records_affected = 0
+            batches_since_commit = 0
+            uncommitted_keys = set()
+            for data in batches:
+                row_counts, errors = load_batch(cursor, table_config, data, index)
+                records_affected += sum(row_counts)
 
-                data = []
-                parameters = []
-                records_affected = 0
-                for line in csv_reader:
-                    i = 0
-                    while i < num_columns:
-                        parameters.append(line[i])
-                        i += 1
-
-                    data_tuple = tuple(parameters)
-                    data.append(data_tuple)
-                    parameters = []
-                    if len(data) % user_config.batch_size == 0:
-                        cursor.executemany(
-                            sql, data, batcherrors=True, arraydmlrowcounts=True
-                        )
-                        data = []
-                        records_affected += sum(cursor.getarraydmlrowcounts())
-                if data:
-                    cursor.executemany(
-                        sql, data, batcherrors=True, arraydmlrowcounts=True
+                # the key is always the first bound column
+                uncommitted_keys.update(
+                    row[0] for row, count in zip(data, row_counts) if count
+                )
+
+                if errors:
+                    write_dead_letters(
+                        user_config, table, table_config.get("fields"), data, errors, offset
                     )
-                    records_affected += sum(cursor.getarraydmlrowcounts())
+
+                if index is not None:
+                    failed = {i for i, _ in errors}
+                    index.add([row[0] for i, row in enumerate(data) if i not in failed])
+
+                offset += len(data)
+                batches_since_commit += 1
+                if (
+                    user_config.commit_interval
+                    and batches_since_commit >= user_config.commit_interval
+                ):
+                    connection.commit()
+                    if run_id:
+                        write_checkpoint(user_config, table, run_id, offset, uncommitted_keys)
+                    touched_keys.update(uncommitted_keys)
+                    uncommitted_keys = set()
+                    batches_since_commit = 0
+
+            if delete_batches is not None:
+                uncommitted_keys.update(
+                    delete_keys(cursor, user_config, table, delete_batches, index)
+                )
 
             connection.commit()
+            touched_keys.update(uncommitted_keys)
+            if user_config.aggregates:
+                write_pending_keys(user_config, table, touched_keys)
+            if index is not None:
+                index.save()
             logger.info(
                 "Table [canvas_%s] had [%s] rows updated or inserted.",
-                csv_file.stem,
+                table,
                 records_affected,
             )
 
-            for error in cursor.getbatcherrors():
-                logger.error("Error %s at row offset %s", error.message, error.offset)
+    if run_id:
+        clear_checkpoint(user_config, table)
 
+    return touched_keys
 
-def main(user_config: dict) -> None:
+
+def update_table_with_csv(user_config: dict, csv_file: Path) -> set:
     """
-    Main function to process CSV files and update the database.
+    Update or insert records from the CSV file into the database table,
+    resuming from the table's checkpoint if one exists for this file, and delete
+    the keys in the matching file in the deletes directory.
 
     :param1 user_config (dict): The user config.
+    :param2 csv_file (Path): The Path to the csv_file.
+    :return: The set of keys of the rows that were updated, inserted or deleted.
+    """
+
+    run_id = get_run_id(csv_file)
+    offset, touched_keys = read_checkpoint(user_config, csv_file.stem, run_id)
+
+    num_columns = len(user_config.canvas_tables.get(csv_file.stem).get("fields"))
+    batches = read_csv_batches(csv_file, num_columns, user_config.batch_size, offset)
+
+    delete_batches = None
+    deletes_file = csv_file.parent / "deletes" / csv_file.name
+    if deletes_file.is_file():
+        delete_batches = read_csv_batches(deletes_file, 1, user_config.batch_size)
+
+    return update_table(
+        user_config, csv_file.stem, batches, run_id, offset, touched_keys, delete_batches
+    )
+
+
+def update_table_with_arrow(user_config: dict, arrow_file: Path) -> set:
+    """
+    Update or insert records from the Arrow IPC (Feather) file into the database table,
+    resuming from the table's checkpoint if one exists for this file, and delete
+    the keys in the matching file in the deletes directory.
+
+    :param1 user_config (dict): The user config.
+    :param2 arrow_file (Path): The Path to the Arrow file.
+    :return: The set of keys of the rows that were updated, inserted or deleted.
+    """
+
+    run_id = get_run_id(arrow_file)
+    offset, touched_keys = read_checkpoint(user_config, arrow_file.stem, run_id)
+
+    num_columns = len(user_config.canvas_tables.get(arrow_file.stem).get("fields"))
+    batches = read_arrow_batches(arrow_file, num_columns, user_config.batch_size, offset)
+
+    delete_batches = None
+    deletes_file = arrow_file.parent / "deletes" / arrow_file.name
+    if deletes_file.is_file():
+        delete_batches = read_arrow_batches(deletes_file, 1, user_config.batch_size)
+
+    return update_table(
+        user_config, arrow_file.stem, batches, run_id, offset, touched_keys, delete_batches
+    )
+
+
+def refresh_aggregates(user_config: dict, touched_keys: dict) -> None:
+    """
+    Refreshes the configured aggregate tables for only the rows affected by this run.
+
+    The keys changed by the loader are staged in each aggregate's `key_table` as
+    (table_name, key_id) pairs, then the aggregate's `db_refresh` statements are run,
+    which recompute the affected rows from the staged keys. Everything is committed
+    in a single transaction.
+
+    :param1 user_config (dict): The user config.
+    :param2 touched_keys (dict): The changed keys, keyed by Canvas table.
     :return: None
     """
+
+    for name, aggregate in user_config.aggregates.items():
+        tables = aggregate.get("tables") or touched_keys.keys()
+        rows = [(table, key) for table in tables for key in touched_keys.get(table, ())]
+
+        if not rows:
+            logger.info("Aggregate [%s] has no changed keys, skipping refresh.", name)
+            continue
+
+        key_table = aggregate.get("key_table")
+        with get_connection(user_config) as connection:
+
+            with connection.cursor() as cursor:
+                cursor.execute(f"delete from {key_table}")
+                cursor.executemany(
+                    f"insert into {key_table} (table_name, key_id) values (:1, :2)", rows
+                )
+
+                for sql in aggregate.get("db_refresh"):
+                    cursor.execute(sql)
+                    logger.info(
+                        "Aggregate [%s] refresh statement affected [%s] rows.",
+                        name,
+                        cursor.rowcount,
+                    )
+
+            connection.commit()
+            logger.info(
+                "Aggregate [%s] refreshed from [%s] changed keys.", name, len(rows)
+            )
+
+
+def update_table_with_file(user_config: dict, final_file: Path) -> set:
+    """
+    Update or insert records from a final data file in the configured final format.
+
+    :param1 user_config (dict): The user config.
+    :param2 final_file (Path): The Path to the final data file.
+    :return: The set of keys of the rows that were updated, inserted or deleted.
+    """
+    if user_config.final_format == "arrow":
+        return update_table_with_arrow(user_config, final_file)
+    return update_table_with_csv(user_config, final_file)
+
+
+def get_final_files(user_config: dict) -> list:
+    """
+    Lists the final data files of the configured tables.
+
+    :param1 user_config (dict): The user config.
+    :return: A list of Paths to the final data files.
+    """
     if not user_config.final_path.is_dir():
         logger.error("The path %s is not a valid directory.", user_config.final_path)
         raise ValueError(f"The path {user_config.final_path} is not a valid directory.")
 
-    csv_files = [file for file in user_config.final_path.glob("*.csv")]
+    return [
+        file
+        for file in user_config.final_path.glob(f"*.{user_config.final_format}")
+        if file.stem in user_config.canvas_tables.keys()
+    ]
+
 
-    for csv_file in csv_files:
-        try:
-            if csv_file.stem in user_config.canvas_tables.keys():
-                update_table_with_csv(user_config, csv_file)
-        except Exception as e:
-            logger.error("An error occurred: %s", e)
-            raise e
+def get_pending_files(user_config: dict) -> list:
+    """
+    Lists the final data files with a checkpoint of an upload that did not finish,
+    which can be resumed as long as the files were not rewritten.
+
+    :param1 user_config (dict): The user config.
+    :return: A list of Paths to the final data files to resume.
+    """
+    pending_files = []
+    for checkpoint_file in (user_config.state_path / "checkpoints").glob("*.json"):
+        final_file = user_config.final_path / f"{checkpoint_file.stem}.{user_config.final_format}"
+        if not final_file.is_file() or final_file.stem not in user_config.canvas_tables:
+            continue
+
+        checkpoint = json.loads(checkpoint_file.read_text(encoding="utf-8"))
+        if checkpoint.get("run_id") == get_run_id(final_file):
+            pending_files.append(final_file)
+
+    return pending_files
+
+
+def load_files(user_configs: list, final_files: list) -> None:
+    """
+    Loads the given final data files, concurrently up to `db_pool_size` at a time
+    through a shared connection pool, then refreshes each instance's aggregates from
+    the keys changed, along with any keys left pending by earlier runs whose load or
+    refresh failed.
+
+    :param1 user_configs (list): The user config of each Canvas instance.
+    :param2 final_files (list): The (user config, final data file) pairs to load.
+    :return: None
+    """
+    global pool
+
+    # all instances share the same Oracle settings
+    pool_size = user_configs[0].db_pool_size
+    pool = create_pool(user_configs[0])
+    try:
+        with ThreadPoolExecutor(max_workers=pool_size) as executor:
+            futures = [
+                executor.submit(update_table_with_file, user_config, final_file)
+                for user_config, final_file in final_files
+            ]
+
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error("An error occurred: %s", e)
+                    raise e
+
+        # refresh the aggregate tables from the committed keys not refreshed yet
+        for user_config in user_configs:
+            refresh_aggregates(user_config, read_pending_keys(user_config))
+            clear_pending_keys(user_config)
+    finally:
+        pool.close(force=True)
+        pool = None
+
+
+def resume(user_configs: list) -> None:
+    """
+    Finishes the uploads a failed run left checkpointed, from the same final data
+    files, before a new run extracts and rewrites them.
+
+    :param1 user_configs (list): The user config of each Canvas instance.
+    :return: None
+    """
+    pending_files = [
+        (user_config, final_file)
+        for user_config in user_configs
+        for final_file in get_pending_files(user_config)
+    ]
+
+    if pending_files:
+        logger.info("Resuming [%s] unfinished table uploads.", len(pending_files))
+        load_files(user_configs, pending_files)
+
+
+def main(user_configs: list) -> None:
+    """
+    Main function to process CSV or Arrow files and update the database.
+
+    The final data files of every Canvas instance are loaded concurrently, see `load_files`.
+
+    :param1 user_configs (list): The user config of each Canvas instance.
+    :return: None
+    """
+    final_files = [
+        (user_config, final_file)
+        for user_config in user_configs
+        for final_file in get_final_files(user_config)
+    ]
+    load_files(user_configs, final_files)
 
 
 if __name__ == "__main__":
-    run_config = config.get_config()
-    main(run_config)
+    run_configs = config.get_configs()
+    main(run_configs)
@@ -0,0 +1,130 @@
+"""
+Keeps a persisted, sorted array of the primary keys known to exist in each Oracle table,
+so the uploader can route new rows to array INSERTs and existing rows to array UPDATEs
+instead of sending every row through MERGE.
+"""
+
+import logging
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class KeyIndex:
+    """
+    Class for a table's key-existence index. The keys are stored as a sorted,
+    unique int64 array in `state_path/key_index/<table>.npz`, along with the time
+    they were last refreshed from Oracle.
+    """
+
+    def __init__(self, user_config: dict, table: str):
+        """
+        Initializes the KeyIndex object for the given table, without loading it.
+
+        :param user_config: The user config.
+        :param table: The Canvas table the index belongs to.
+        """
+        self.table = table
+        self.settings = user_config.canvas_tables.get(table).get("key_index")
+        self.path = user_config.state_path / "key_index" / f"{table}.npz"
+        self.max_age = self.settings.get("max_age") or 7
+        self.keys = np.empty(0, dtype=np.int64)
+        self.refreshed_at = 0.0
+
+    def is_stale(self) -> bool:
+        """
+        Checks whether the index was last refreshed from Oracle more than `max_age` days ago.
+
+        :return: True if the index needs to be refreshed from Oracle.
+        """
+        return time.time() - self.refreshed_at > self.max_age * 86400
+
+    def load(self, cursor) -> None:
+        """
+        Loads the persisted index, refreshing it from Oracle first if it is stale.
+
+        :param cursor: An Oracle database cursor.
+        :return: None
+        """
+        if self.path.is_file():
+            with np.load(self.path) as index:
+                self.keys = index["keys"]
+                self.refreshed_at = float(index["refreshed_at"])
+
+        if self.is_stale():
+            self.refresh(cursor)
+        else:
+            logger.info(
+                "Loaded key index for table [canvas_%s] with [%s] keys.",
+                self.table,
+                len(self.keys),
+            )
+
+    def refresh(self, cursor) -> None:
+        """
+        Rebuilds the index from the keys currently in the Oracle table, and persists it.
+
+        :param cursor: An Oracle database cursor.
+        :return: None
+        """
+        cursor.arraysize = 100000
+        cursor.execute(
+            f"select {self.settings.get('db_key')} from {self.settings.get('db_table')}"
+        )
+
+        chunks = []
+        while rows := cursor.fetchmany():
+            chunks.append(np.array([row[0] for row in rows], dtype=np.int64))
+
+        self.keys = np.unique(np.concatenate(chunks or [np.empty(0, dtype=np.int64)]))
+        self.refreshed_at = time.time()
+        self.save()
+        logger.info(
+            "Refreshed key index for table [canvas_%s] from Oracle with [%s] keys.",
+            self.table,
+            len(self.keys),
+        )
+
+    def save(self) -> None:
+        """
+        Persists the index.
+
+        :return: None
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "wb") as index_stream:
+            np.savez(index_stream, keys=self.keys, refreshed_at=self.refreshed_at)
+
+    def contains(self, keys: list) -> np.ndarray:
+        """
+        Checks which of the given keys are in the index.
+
+        :param keys: The keys to look up.
+        :return: A boolean array, True where the key is known to exist.
+        """
+        keys = np.asarray(keys).astype(np.int64)
+        positions = np.searchsorted(self.keys, keys)
+        found = positions < len(self.keys)
+        found[found] = self.keys[positions[found]] == keys[found]
+        return found
+
+    def add(self, keys: list) -> None:
+        """
+        Adds keys to the index.
+
+        :param keys: The keys to add.
+        :return: None
+        """
+        if len(keys):
+            self.keys = np.union1d(self.keys, np.asarray(keys).astype(np.int64))
+
+    def remove(self, keys: list) -> None:
+        """
+        Removes keys from the index.
+
+        :param keys: The keys to remove.
+        :return: None
+        """
+        if len(keys):
+            self.keys = np.setdiff1d(self.keys, np.asarray(keys).astype(np.int64))
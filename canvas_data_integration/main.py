@@ -1,9 +1,10 @@
 """
 The running script.
-    * First, retrieves the data from Canvas
+    * First, finishes any checkpointed uploads of a failed run, then retrieves the data from Canvas
     * Second, imports the data from the generated data files into dataframes, flattens,
       renames, and drops columns, finally outputting final data files
     * Third, merges data from final data files into database tables
+    * Finally, backfills the columns of fields added to the configured tables
 """
 
 import asyncio
@@ -11,24 +12,37 @@ import config
 import canvas_extractor
 import data_transformer
 import database_uploader
+import backfiller
 
 
 async def run_pipeline():
     """
-    Runs the main project pipeline.
+    Runs the main project pipeline for every configured Canvas instance.
     """
-    # get the processed user config
-    user_config = config.get_config()
+    # get the processed user config of each Canvas instance
+    user_configs = config.get_configs()
+
+    # finishes the uploads a failed run left checkpointed, before their files are rewritten
+    database_uploader.resume(user_configs)
 
     # extracts data files from Canvas
-    await canvas_extractor.main(user_config)
+    await canvas_extractor.main(user_configs)
 
     # gets data into dataframes from the Canvas data files,
     # then flattens, drops extraneous columns, and exports them to data/final
-    data_transformer.main(user_config)
+    await asyncio.gather(
+        *[
+            asyncio.to_thread(data_transformer.main, user_config)
+            for user_config in user_configs
+        ]
+    )
 
     # merges final data files to database
-    database_uploader.main(user_config)
+    database_uploader.main(user_configs)
+
+    # fills in the fields added to the tables since the last run from DAP snapshots
+    for user_config in user_configs:
+        await backfiller.main(user_config)
 
 
 if __name__ == "__main__":
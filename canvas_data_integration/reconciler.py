@@ -0,0 +1,320 @@
+"""
+Reconciles Oracle tables against a fresh DAP snapshot without reloading them.
+
+Each table's key space is split into ranges, and the row counts and aggregate hashes
+of the configured columns are compared range by range. Only the ranges that differ are
+drilled into key by key, and the keys that are missing or different in Oracle are repaired
+through the normal loader.
+"""
+
+import asyncio
+import hashlib
+import logging
+from decimal import Decimal
+import pandas as pd
+from dap.dap_types import Format
+import canvas_extractor
+import data_transformer
+import database_uploader
+import utils
+import config
+
+logger = logging.getLogger(__name__)
+
+# keeps summed range hashes exact when they pass through floats
+HASH_MODULUS = 2**32
+
+
+def hash_text(text: str) -> int:
+    """
+    Hashes a row's text the same way Oracle does in the reconcile queries:
+    the first 8 hex digits of the MD5 digest, as an integer.
+
+    :param1 text (str): The row's concatenated column values.
+    :return: The row hash.
+    """
+    return int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def number_text(value: float) -> str:
+    """
+    Renders a number the way Oracle converts a NUMBER to text in the reconcile
+    expressions (`TO_CHAR` without a format): in positional notation, without
+    trailing zeros, and without the zero before the decimal point, e.g. `.5`.
+
+    :param1 value (float): The number to render.
+    :return: The number as text.
+    """
+    text = format(Decimal(repr(value)), "f")
+    if "." in text:
+        text = text.rstrip("0").rstrip(".")
+    if text.startswith(("0.", "-0.")):
+        text = text.replace("0.", ".", 1)
+    return text
+
+
+def to_text(series: pd.Series) -> pd.Series:
+    """
+    Converts a column to the text DAP delivered it as, with nulls as empty strings.
+    Whole-number floats (integer columns that contain nulls) lose their trailing `.0`,
+    and other floats are rendered like Oracle renders numbers, see `number_text`.
+
+    :param1 series (pd.Series): The column to convert.
+    :return: The column as strings.
+    """
+    if pd.api.types.is_float_dtype(series):
+        values = series.dropna()
+        if (values == values.round()).all():
+            series = series.astype("Int64")
+        else:
+            series = series.map(number_text, na_action="ignore")
+    return series.astype(object).where(series.notna(), "").astype(str)
+
+
+def hash_rows(df: pd.DataFrame, columns: list) -> pd.Series:
+    """
+    Computes the hash of each row over the given columns.
+
+    :param1 df (pd.DataFrame): The DAP snapshot DataFrame.
+    :param2 columns (list): The DAP fields to hash, in order.
+    :return: A Series of row hashes.
+    """
+    text = to_text(df[columns[0]])
+    for column in columns[1:]:
+        text = text + "|" + to_text(df[column])
+    return text.map(hash_text)
+
+
+def hash_expression(reconcile: dict) -> str:
+    """
+    Builds the Oracle expression matching `hash_rows` for the configured columns.
+
+    :param1 reconcile (dict): The table's reconcile configuration.
+    :return: The SQL expression of the row hash.
+    """
+    text = " || '|' || ".join(reconcile.get("columns").values())
+    return f"to_number(substr(rawtohex(standard_hash({text}, 'MD5')), 1, 8), 'XXXXXXXX')"
+
+
+def get_range_summaries(
+    cursor, reconcile: dict, lower: int, width: int, ranges: int
+) -> pd.DataFrame:
+    """
+    Retrieves the row count and aggregate hash of each key range from Oracle.
+    Keys outside of the snapshot's key space fall into the first or last range.
+
+    :param1 cursor: An Oracle database cursor.
+    :param2 reconcile (dict): The table's reconcile configuration.
+    :param3 lower (int): The lowest key in the snapshot.
+    :param4 width (int): The width of each key range.
+    :param5 ranges (int): The number of key ranges.
+    :return: A DataFrame with row_count and row_hash, indexed by range.
+    """
+    db_key = reconcile.get("db_key")
+    bucket = f"least(greatest(floor(({db_key} - :lower_key) / :range_width), 0), :last_range)"
+    sql = (
+        f"select bucket, count(*), mod(sum(row_hash), {HASH_MODULUS}) from ("
+        f"select {bucket} as bucket, {hash_expression(reconcile)} as row_hash "
+        f"from {reconcile.get('db_table')}) group by bucket"
+    )
+    cursor.execute(sql, lower_key=lower, range_width=width, last_range=ranges - 1)
+    rows = cursor.fetchall()
+
+    return pd.DataFrame(
+        [(int(bucket), int(count), int(row_hash)) for bucket, count, row_hash in rows],
+        columns=["bucket", "row_count", "row_hash"],
+    ).set_index("bucket")
+
+
+def get_key_hashes(
+    cursor, reconcile: dict, lower: int | None, upper: int | None
+) -> pd.Series:
+    """
+    Retrieves the hash of each row in a key range from Oracle.
+
+    :param1 cursor: An Oracle database cursor.
+    :param2 reconcile (dict): The table's reconcile configuration.
+    :param3 lower (int): The lowest key of the range, or None if unbounded.
+    :param4 upper (int): The highest key of the range, or None if unbounded.
+    :return: A Series of row hashes, indexed by key.
+    """
+    db_key = reconcile.get("db_key")
+    sql = (
+        f"select {db_key}, {hash_expression(reconcile)} from {reconcile.get('db_table')} "
+        f"where (:lower_key is null or {db_key} >= :lower_key) "
+        f"and (:upper_key is null or {db_key} <= :upper_key)"
+    )
+    cursor.execute(sql, lower_key=lower, upper_key=upper)
+    rows = cursor.fetchall()
+
+    return pd.Series(
+        {int(key): int(row_hash) for key, row_hash in rows}, dtype="int64"
+    )
+
+
+def find_drifted_keys(user_config: dict, table: str, df: pd.DataFrame) -> tuple:
+    """
+    Compares the DAP snapshot with the Oracle table range by range, drilling down
+    only into the ranges that differ.
+
+    :param1 user_config (dict): The user config.
+    :param2 table (str): The Canvas table to reconcile.
+    :param3 df (pd.DataFrame): The DAP snapshot DataFrame for the table.
+    :return: A tuple of (keys missing or different in Oracle, keys only in Oracle).
+    """
+    reconcile = user_config.canvas_tables.get(table).get("reconcile")
+    ranges = reconcile.get("ranges") or 64
+
+    keys = df["key.id"].astype("int64")
+    hashes = hash_rows(df, list(reconcile.get("columns").keys()))
+    lower, upper = int(keys.min()), int(keys.max())
+    width = max(-(-(upper - lower + 1) // ranges), 1)
+
+    local = pd.DataFrame(
+        {"key": keys, "row_hash": hashes, "bucket": ((keys - lower) // width).clip(0, ranges - 1)}
+    )
+    local_summaries = local.groupby("bucket").agg(
+        row_count=("key", "size"), row_hash=("row_hash", "sum")
+    )
+    local_summaries["row_hash"] = local_summaries["row_hash"] % HASH_MODULUS
+
+    drifted_keys = set()
+    orphaned_keys = set()
+    with database_uploader.get_connection(user_config) as connection:
+
+        with connection.cursor() as cursor:
+            db_summaries = get_range_summaries(cursor, reconcile, lower, width, ranges)
+            summaries = local_summaries.join(
+                db_summaries, how="outer", lsuffix="_dap", rsuffix="_db"
+            ).fillna(0)
+            differing = summaries[
+                (summaries["row_count_dap"] != summaries["row_count_db"])
+                | (summaries["row_hash_dap"] != summaries["row_hash_db"])
+            ].index
+
+            logger.info(
+                "Table [canvas_%s] has [%s] of [%s] key ranges that differ.",
+                table,
+                len(differing),
+                ranges,
+            )
+
+            for bucket in differing:
+                bucket = int(bucket)
+                range_lower = None if bucket == 0 else lower + bucket * width
+                range_upper = None if bucket == ranges - 1 else lower + (bucket + 1) * width - 1
+
+                db_hashes = get_key_hashes(cursor, reconcile, range_lower, range_upper)
+                dap_hashes = local[local["bucket"] == bucket].set_index("key")["row_hash"]
+
+                compared = dap_hashes.to_frame("dap").join(db_hashes.rename("db"), how="left")
+                drifted_keys.update(compared[compared["dap"] != compared["db"]].index)
+                orphaned_keys.update(db_hashes.index.difference(dap_hashes.index))
+
+    return drifted_keys, orphaned_keys
+
+
+def repair_keys(user_config: dict, table: str, df: pd.DataFrame, keys: set) -> None:
+    """
+    Merges the DAP snapshot rows for the given keys into Oracle through the normal loader,
+    with the table's `db_query`. The key index is skipped, since it may still list the
+    keys of rows that are missing from Oracle, and their UPDATEs would match nothing.
+
+    :param1 user_config (dict): The user config.
+    :param2 table (str): The Canvas table to repair.
+    :param3 df (pd.DataFrame): The DAP snapshot DataFrame for the table.
+    :param4 keys (set): The keys to repair.
+    :return: None
+    """
+    fields = user_config.canvas_tables.get(table).get("fields")
+    repair_df = df[df["key.id"].astype("int64").isin(keys)].reindex(columns=fields)
+    repair_df = repair_df.astype(object).where(repair_df.notna(), None)
+
+    rows = list(repair_df.itertuples(index=False, name=None))
+    batches = (
+        rows[i : i + user_config.batch_size]
+        for i in range(0, len(rows), user_config.batch_size)
+    )
+    database_uploader.update_table(user_config, table, batches, use_index=False)
+
+
+async def main(user_config: dict) -> None:
+    """
+    Main function to reconcile the Oracle tables that have a `reconcile` configuration.
+
+    :param1 user_config (dict): The user config.
+    :return: None
+    """
+    tables = {
+        table: table_config
+        for table, table_config in user_config.canvas_tables.items()
+        if table_config.get("reconcile")
+    }
+
+    if not tables:
+        logger.warning("No tables in config.yml have a 'reconcile' configuration.")
+        return
+
+    reconcile_path = user_config.temp_path / "reconcile"
+    utils.empty_temp(reconcile_path)
+
+    # pull fresh snapshots of the tables to reconcile
+    async with canvas_extractor.get_client(user_config) as session:
+        await asyncio.gather(
+            *[
+                canvas_extractor.get_canvas_data(
+                    session,
+                    table,
+                    reconcile_path,
+                    user_config.last_seen,
+                    Format.JSONL,
+                    None,
+                    "snapshot",
+                    user_config.namespace,
+                )
+                for table in tables
+            ]
+        )
+
+    # keep the loaded fields, the filtered fields and the hashed fields for each table
+    columns_mapping = {
+        table: {
+            "fields": data_transformer.get_projection(table_config)
+            + [
+                field
+                for field in table_config.get("reconcile").get("columns")
+                if field not in data_transformer.get_projection(table_config)
+            ]
+        }
+        for table, table_config in tables.items()
+    }
+    dataframes = data_transformer.load_and_process_json_files(
+        reconcile_path / "jsonl", columns_mapping
+    )
+
+    for table, df in dataframes.items():
+        # rows excluded by the table's filter are never loaded, so they are not drift
+        df = data_transformer.apply_filter(df, table, tables.get(table).get("filter"))
+        drifted_keys, orphaned_keys = find_drifted_keys(user_config, table, df)
+
+        if orphaned_keys:
+            logger.warning(
+                "Table [canvas_%s] has [%s] rows in Oracle that are not in the DAP snapshot.",
+                table,
+                len(orphaned_keys),
+            )
+
+        if drifted_keys:
+            logger.info(
+                "Table [canvas_%s] repairing [%s] missing or different rows.",
+                table,
+                len(drifted_keys),
+            )
+            repair_keys(user_config, table, df, drifted_keys)
+        else:
+            logger.info("Table [canvas_%s] is in sync with DAP.", table)
+
+
+if __name__ == "__main__":
+    for run_config in config.get_configs():
+        asyncio.run(main(run_config))
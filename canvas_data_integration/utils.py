@@ -11,13 +11,13 @@ logger = logging.getLogger(__name__)
 
 def empty_temp(temp_path: Path) -> None:
     """
-    Empties the data/temp folder of data files.
+    Empties the data/temp folder, or another data folder, of data files.
 
     :param temp_path: Path to the directory that stores the temporary data files.
     :return: None
     """
 
-    file_extensions = [".csv", ".json", ".tsv", ".parquet"]
+    file_extensions = [".csv", ".json", ".tsv", ".parquet", ".arrow"]
     files = [p for p in temp_path.rglob("*") if p.suffix in file_extensions]
 
     print(files)
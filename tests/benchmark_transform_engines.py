@@ -0,0 +1,53 @@
+"""
+Benchmarks the transform engines on the same generated pull in each DAP format, and checks
+that they write identical final data files.
+
+Usage: python tests/benchmark_transform_engines.py [rows]
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "canvas_data_integration"))
+
+from transform_fixtures import (  # noqa: E402
+    assert_same_binds,
+    generate_records,
+    get_config,
+    read_final,
+    run_engine,
+    write_pull,
+)
+
+CONDITIONS = ["value.workflow_state in [available, completed]"]
+
+
+def main(rows: int) -> None:
+    """
+    Runs both engines over a pull of `rows` records in each format and prints their run times.
+
+    :param1 rows (int): The number of records in the pull.
+    :return: None
+    """
+    records = generate_records(rows)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        directory = Path(temp_dir)
+        for data_format in ("jsonl", "csv", "tsv"):
+            write_pull(directory / "temp", data_format, records)
+
+            finals, seconds = {}, {}
+            for engine in ("pandas", "arrow"):
+                user_config = get_config(directory, engine, data_format, "arrow", CONDITIONS)
+                seconds[engine] = run_engine(user_config)
+                finals[engine] = read_final(user_config)
+
+            assert_same_binds(finals["pandas"], finals["arrow"])
+            print(
+                f"{data_format:>5} {rows} rows: pandas {seconds['pandas']:.2f}s, "
+                f"arrow {seconds['arrow']:.2f}s ({seconds['pandas'] / seconds['arrow']:.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 400000)
@@ -0,0 +1,9 @@
+"""
+Makes the canvas_data_integration modules importable the way they import each other.
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "canvas_data_integration"))
+sys.path.insert(0, str(Path(__file__).parent))
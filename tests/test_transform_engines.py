@@ -0,0 +1,140 @@
+"""
+Conformance tests of the transform engines: `PandasEngine` and `ArrowEngine` must produce
+the same final data files from the same DAP pulls.
+"""
+
+import pyarrow.feather as feather
+import data_transformer
+import pytest
+from transform_fixtures import (
+    FIELDS,
+    TABLE,
+    assert_same_binds,
+    generate_records,
+    get_config,
+    read_final,
+    run_engine,
+    write_pull,
+)
+
+CONDITIONS = [
+    [],
+    ["value.workflow_state in [available, completed]"],
+    ["value.workflow_state not in [deleted]"],
+    ["value.account_id == 1"],
+    ["value.account_id != 2"],
+    ["meta.ts >= 2024-01-03"],
+    ["meta.ts <= 2024-01-06"],
+    ["value.score > 50"],
+    ["value.score < 90"],
+    ["value.sis_source_id in ['0042', '7']"],
+    ["value.is_public == true"],
+    ["value.empty in [x]"],
+    ["value.empty not in [x]"],
+    ["value.empty != x", "value.account_id in [1, 3]", "meta.ts > 2024-01-02"],
+]
+
+
+@pytest.fixture(scope="module", params=["jsonl", "csv", "tsv"])
+def pull(request, tmp_path_factory):
+    """
+    Writes the same pull in each DAP format.
+    """
+    directory = tmp_path_factory.mktemp(request.param)
+    records = generate_records(2000, seed=7)
+    write_pull(directory / "temp", request.param, records)
+    return directory, request.param, records
+
+
+@pytest.mark.parametrize("final_format", ["csv", "arrow"])
+@pytest.mark.parametrize("conditions", CONDITIONS, ids=lambda conditions: " and ".join(conditions) or "no filter")
+def test_engines_write_identical_final_files(pull, final_format, conditions):
+    directory, data_format, _ = pull
+    finals = {}
+    for engine in ("pandas", "arrow"):
+        user_config = get_config(directory, engine, data_format, final_format, conditions)
+        run_engine(user_config)
+        finals[engine] = (
+            read_final(user_config),
+            read_final(user_config, user_config.final_path / "deletes"),
+        )
+
+    assert_same_binds(finals["pandas"][0], finals["arrow"][0])
+    assert_same_binds(finals["pandas"][1], finals["arrow"][1])
+
+
+def get_newest_records(records: list) -> dict:
+    """
+    Finds the newest record of each key, upsert or delete, the one with the latest
+    `meta.ts`, or the last one when they tie.
+    """
+    newest = {}
+    for record in records:
+        key = record.get("key.id")
+        if key not in newest or record.get("meta.ts") >= newest[key].get("meta.ts"):
+            newest[key] = record
+    return newest
+
+
+@pytest.mark.parametrize("engine", ["pandas", "arrow"])
+def test_engines_keep_the_newest_record_of_each_key(pull, engine):
+    directory, data_format, records = pull
+    user_config = get_config(directory, engine, data_format, "csv", [])
+    run_engine(user_config)
+
+    newest = get_newest_records(records)
+    final_df = read_final(user_config)
+    deletes_df = read_final(user_config, user_config.final_path / "deletes")
+    assert final_df[f"{TABLE}_id"].is_unique
+    assert deletes_df[f"{TABLE}_id"].is_unique
+    assert dict(zip(final_df[f"{TABLE}_id"].map(int), final_df[f"{TABLE}_ts"])) == {
+        key: record.get("meta.ts")
+        for key, record in newest.items()
+        if record.get("meta.action") != "D"
+    }
+    assert set(deletes_df[f"{TABLE}_id"].map(int)) == {
+        key for key, record in newest.items() if record.get("meta.action") == "D"
+    }
+
+
+@pytest.mark.parametrize("engine", ["pandas", "arrow"])
+def test_engines_keep_dap_text(pull, engine, monkeypatch):
+    directory, data_format, records = pull
+    # read the pull in many blocks, so fields first set late in it are not in the first one
+    monkeypatch.setattr(data_transformer, "BLOCK_SIZE", 1 << 14)
+    user_config = get_config(directory, engine, data_format, "csv", [])
+    run_engine(user_config)
+
+    final_df = read_final(user_config)
+    for field in ("value.start_at", "value.sis_source_id", "value.conclude_at"):
+        text = {record.get(field) for record in records} - {None}
+        assert set(final_df[f"{TABLE}_{field.split('.', 1)[1]}"]) - {""} == text
+    assert set(final_df[f"{TABLE}_is_public"]) == {"True", "False"}
+
+
+@pytest.mark.parametrize("engine", ["pandas", "arrow"])
+def test_engines_route_filtered_out_keys_to_deletes(pull, engine):
+    directory, data_format, records = pull
+    user_config = get_config(
+        directory, engine, data_format, "csv", ["value.workflow_state in [available]"]
+    )
+    run_engine(user_config)
+
+    kept = set(read_final(user_config)[f"{TABLE}_id"].map(int))
+    deleted = set(read_final(user_config, user_config.final_path / "deletes")[f"{TABLE}_id"].map(int))
+    assert kept == {
+        key
+        for key, record in get_newest_records(records).items()
+        if record.get("meta.action") != "D" and record.get("value.workflow_state") == "available"
+    }
+    assert deleted == {record.get("key.id") for record in records} - kept
+
+
+@pytest.mark.parametrize("engine", ["pandas", "arrow"])
+def test_engines_write_arrow_finals_with_only_the_fields(pull, engine):
+    directory, data_format, _ = pull
+    user_config = get_config(directory, engine, data_format, "arrow", ["value.account_id != 2"])
+    run_engine(user_config)
+
+    final_table = feather.read_table(user_config.final_path / f"{TABLE}.arrow")
+    assert final_table.column_names == [f"{TABLE}_{field.split('.', 1)[1]}" for field in FIELDS]
@@ -0,0 +1,240 @@
+"""
+Generates DAP-like JSON Lines, CSV and TSV pulls for the transform engine conformance
+tests and benchmark, and runs a transform engine over them.
+
+The pulls have delete records, duplicate keys with shuffled timestamps, nulls, a field
+that is null in every record, identifiers with leading zeros, and date-like text,
+including a field that is only set late in the pull.
+"""
+
+import csv
+import json
+import random
+import time
+from pathlib import Path
+from types import SimpleNamespace
+import pandas as pd
+import pyarrow.feather as feather
+import data_transformer
+import database_uploader
+
+TABLE = "courses"
+
+FIELDS = [
+    "key.id",
+    "value.name",
+    "value.account_id",
+    "value.score",
+    "value.is_public",
+    "value.workflow_state",
+    "value.start_at",
+    "value.sis_source_id",
+    "value.conclude_at",
+    "value.empty",
+    "meta.ts",
+]
+
+
+def generate_records(rows: int, seed: int = 0) -> list:
+    """
+    Generates the records of a pull, as flat dictionaries of the DAP fields.
+
+    :param1 rows (int): The number of records.
+    :param2 seed (int): The random seed.
+    :return: The list of records.
+    """
+    rng = random.Random(seed)
+    records = []
+    for i in range(rows):
+        # about two records per key, with timestamps that are not in file order
+        key = rng.randint(1, max(rows // 2, 1))
+        ts = f"2024-01-{rng.randint(1, 9):02d}T{rng.randint(0, 23):02d}:00:00.{i % 1000:03d}Z"
+        if rng.random() < 0.05:
+            records.append({"key.id": key, "meta.action": "D", "meta.ts": ts})
+            continue
+
+        records.append(
+            {
+                "key.id": key,
+                "value.name": rng.choice(["alpha", "beta, gamma", "tab\there", "", None]),
+                "value.account_id": rng.choice([1, 2, 3, None]),
+                "value.score": rng.choice([12.5, 50.0, 85.25, 99.75, None]),
+                "value.is_public": rng.choice([True, False]),
+                "value.workflow_state": rng.choice(["available", "completed", "deleted", None]),
+                "value.start_at": rng.choice(["2024-01-01", "2024-02-01T08:00:00+05:00", None]),
+                "value.sis_source_id": rng.choice(["00123", "0042", "7", None]),
+                # null until the last quarter of the pull, past the readers' first blocks
+                "value.conclude_at": "2024-05-01T12:00:00.000Z" if i >= rows * 3 // 4 else None,
+                "value.empty": None,
+                "meta.action": "U",
+                "meta.ts": ts,
+            }
+        )
+
+    return records
+
+
+def write_pull(directory: Path, data_format: str, records: list) -> None:
+    """
+    Writes the records as a DAP download of the given format into `directory/<format>`.
+
+    :param1 directory (Path): The temp data directory.
+    :param2 data_format (str): The format of the pull: `jsonl`, `csv` or `tsv`.
+    :param3 records (list): The records from `generate_records`.
+    :return: None
+    """
+    data_path = directory / data_format
+    data_path.mkdir(parents=True, exist_ok=True)
+    columns = FIELDS + ["meta.action"]
+
+    if data_format == "jsonl":
+        with open(data_path / f"{TABLE}.json", "w", encoding="utf-8") as json_stream:
+            for record in records:
+                nested = {}
+                for field, value in record.items():
+                    parent, name = field.split(".", 1)
+                    nested.setdefault(parent, {})[name] = value
+                json_stream.write(json.dumps(nested) + "\n")
+
+    elif data_format == "csv":
+        with open(data_path / f"{TABLE}.csv", "w", encoding="utf-8", newline="") as csv_stream:
+            csv_writer = csv.writer(csv_stream)
+            csv_writer.writerow(columns)
+            for record in records:
+                csv_writer.writerow(
+                    ["" if record.get(col) is None else to_text(record.get(col)) for col in columns]
+                )
+
+    else:
+        with open(data_path / f"{TABLE}.tsv", "w", encoding="utf-8", newline="") as tsv_stream:
+            tsv_stream.write("\t".join(columns) + "\n")
+            for record in records:
+                values = [
+                    "\\N" if record.get(col) is None else escape_tsv(to_text(record.get(col)))
+                    for col in columns
+                ]
+                tsv_stream.write("\t".join(values) + "\n")
+
+
+def to_text(value) -> str:
+    """
+    Renders a value the way DAP writes it in CSV and TSV files.
+
+    :param1 value: The value.
+    :return: The value as text.
+    """
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def escape_tsv(text: str) -> str:
+    """
+    Escapes a TSV value the way DAP does.
+
+    :param1 text (str): The value.
+    :return: The escaped value.
+    """
+    return text.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def get_config(directory: Path, engine: str, data_format: str, final_format: str, conditions: list) -> SimpleNamespace:
+    """
+    Builds the parts of the user config the transformer uses.
+
+    :param1 directory (Path): The working directory of the run.
+    :param2 engine (str): The transform engine: `pandas` or `arrow`.
+    :param3 data_format (str): The format of the pull: `jsonl`, `csv` or `tsv`.
+    :param4 final_format (str): The format of the final data files: `csv` or `arrow`.
+    :param5 conditions (list): The table's filter conditions.
+    :return: The user config.
+    """
+    table_config = {
+        "fields": FIELDS,
+        "db_delete": f"delete from canvas_{TABLE} where {TABLE}_id = :1",
+    }
+    if conditions:
+        table_config["filter"] = conditions
+
+    return SimpleNamespace(
+        transform_engine=engine,
+        str_format=data_format.upper(),
+        temp_path=directory / "temp",
+        final_path=directory / f"final_{engine}_{final_format}",
+        final_format=final_format,
+        batch_size=1000,
+        canvas_tables={TABLE: table_config},
+    )
+
+
+def read_final(user_config: SimpleNamespace, final_path: Path = None) -> pd.DataFrame:
+    """
+    Reads a final data file back as the bind tuples the uploader reads from it, without
+    parsing its values again.
+
+    :param1 user_config (SimpleNamespace): The user config of the run.
+    :param2 final_path (Path): The directory of the final file, defaults to `final_path`.
+    :return: The bind values as an object DataFrame, with the final file's column names.
+    """
+    final_file = (final_path or user_config.final_path) / f"{TABLE}.{user_config.final_format}"
+    if not final_file.is_file():
+        return pd.DataFrame()
+
+    if user_config.final_format == "arrow":
+        columns = feather.read_table(final_file).column_names
+        batches = database_uploader.read_arrow_batches(final_file, len(columns), user_config.batch_size)
+    else:
+        with open(final_file, "r", encoding="utf-8", newline="") as csv_stream:
+            columns = next(csv.reader(csv_stream))
+        batches = database_uploader.read_csv_batches(final_file, len(columns), user_config.batch_size)
+
+    return pd.DataFrame([row for batch in batches for row in batch], columns=columns, dtype=object)
+
+
+def is_allowed_difference(pandas_value, arrow_value) -> bool:
+    """
+    Checks whether two values the engines bind for the same field differ in an allowed way.
+
+    The only allowed difference: pandas reads numeric JSON fields that contain nulls as floats, so a whole number is bound as `2.0` (text in
+    CSV files, a float in Arrow files) where Arrow binds `2`. Oracle loads both as the
+    same NUMBER.
+
+    :param1 pandas_value: The value bound from the pandas engine's final file.
+    :param2 arrow_value: The value bound from the Arrow engine's final file.
+    :return: True if the difference is allowed.
+    """
+    if isinstance(pandas_value, str):
+        return pandas_value == f"{arrow_value}.0"
+    return isinstance(pandas_value, float) and isinstance(arrow_value, int) and pandas_value == arrow_value
+
+
+def assert_same_binds(pandas_df: pd.DataFrame, arrow_df: pd.DataFrame) -> None:
+    """
+    Asserts that the engines' final files bind the same values, see `read_final`,
+    apart from the differences allowed by `is_allowed_difference`.
+
+    :param1 pandas_df (pd.DataFrame): The binds of the pandas engine's final file.
+    :param2 arrow_df (pd.DataFrame): The binds of the Arrow engine's final file.
+    :return: None
+    """
+    assert list(pandas_df.columns) == list(arrow_df.columns)
+    assert len(pandas_df) == len(arrow_df)
+    differences = [
+        (pandas_value, arrow_value)
+        for pandas_row, arrow_row in zip(pandas_df.itertuples(index=False), arrow_df.itertuples(index=False))
+        for pandas_value, arrow_value in zip(pandas_row, arrow_row)
+        if pandas_value != arrow_value or type(pandas_value) is not type(arrow_value)
+    ]
+    assert all(is_allowed_difference(*difference) for difference in differences), differences[:5]
+
+
+def run_engine(user_config: SimpleNamespace) -> float:
+    """
+    Runs the transformer with the config's engine.
+
+    :param1 user_config (SimpleNamespace): The user config of the run.
+    :return: The run time in seconds.
+    """
+    start = time.perf_counter()
+    data_transformer.main(user_config)
+    return time.perf_counter() - start